@@ -5,12 +5,161 @@ This module handles mapping of detected bounding boxes to structured fields.
 Supports sequential and positional mapping strategies.
 """
 
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
+from itertools import islice
 import logging
+import numpy as np
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
 
 logger = logging.getLogger(__name__)
 
 
+class MappedFields(dict):
+    """
+    Field assignments of a mapping result.
+    
+    A regular dictionary of {field_name: {'text', 'confidence', 'box'} or None},
+    so it can be modified and serialized like the rest of the result. It is
+    built from parallel per-field lists, which can be read back through the
+    field_names, texts, confidences and boxes properties. If a field name is
+    repeated, the last assignment wins.
+    """
+    
+    @classmethod
+    def from_columns(cls, field_names: List[str], texts: List[Optional[str]],
+                     confidences: List[Optional[float]],
+                     boxes: List[Optional[List]]) -> 'MappedFields':
+        """
+        Build field assignments from parallel lists.
+        
+        Args:
+            field_names: Field name of each entry
+            texts: Detected text of each entry (None if the field is empty)
+            confidences: Confidence of each entry
+            boxes: Box coordinates of each entry
+            
+        Returns:
+            MappedFields with one entry per distinct field name
+        """
+        return cls(
+            (name, {'text': text, 'confidence': confidence, 'box': box}
+             if text is not None else None)
+            for name, text, confidence, box in zip(field_names, texts, confidences, boxes)
+        )
+    
+    @property
+    def field_names(self) -> List[str]:
+        return list(self)
+    
+    @property
+    def texts(self) -> List[Optional[str]]:
+        return [data['text'] if data is not None else None for data in self.values()]
+    
+    @property
+    def confidences(self) -> np.ndarray:
+        """Confidence per field as a float array (NaN for empty fields)."""
+        return np.array([data['confidence'] if data is not None else np.nan
+                         for data in self.values()], dtype=np.float64)
+    
+    @property
+    def boxes(self) -> List[Optional[List]]:
+        return [data['box'] if data is not None else None for data in self.values()]
+    
+    def as_dict(self) -> Dict[str, Optional[Dict]]:
+        """
+        Convert to a plain dictionary.
+        
+        Returns:
+            Dictionary with field names and text/confidence/box entries
+        """
+        return dict(self)
+
+
+def _assign_regions_numpy(centers: np.ndarray, regions: np.ndarray, mbr: np.ndarray,
+                          confidences: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Assign normalized box centers to regions using NumPy broadcasting.
+    
+    Args:
+        centers: (N, 2) array of normalized box centers
+        regions: (R, 4) array of [x_min, y_min, x_max, y_max] regions
+        mbr: Bounding rectangle of all valid regions (NaN if there are none)
+        confidences: (N,) array of box confidences
+        
+    Returns:
+        Tuple of (region index per box or -1, winning box index per region or -1)
+    """
+    matched = np.full(len(centers), -1, dtype=np.int64)
+    
+    # Fast reject boxes outside the bounding rectangle of all regions
+    candidates = np.flatnonzero(
+        (centers[:, 0] >= mbr[0]) & (centers[:, 0] <= mbr[2]) &
+        (centers[:, 1] >= mbr[1]) & (centers[:, 1] <= mbr[3])
+    )
+    if len(candidates):
+        cx = centers[candidates, 0, None]
+        cy = centers[candidates, 1, None]
+        
+        # Containment test for every (box, region) pair in one broadcast;
+        # argmax picks the first matching region in config order
+        mask = (
+            (cx >= regions[None, :, 0]) & (cx <= regions[None, :, 2]) &
+            (cy >= regions[None, :, 1]) & (cy <= regions[None, :, 3])
+        )
+        matched[candidates] = np.where(mask.any(axis=1), mask.argmax(axis=1), -1)
+    
+    # If multiple boxes match the same region, keep the one with higher confidence.
+    # Confidences are never negative, so the -1.0 sentinel lets the first box
+    # win without a separate "region still empty" check
+    winner = np.full(len(regions), -1, dtype=np.int64)
+    best_conf = [-1.0] * len(regions)
+    for box_idx in np.flatnonzero(matched >= 0).tolist():
+        region_idx = matched[box_idx]
+        confidence = confidences[box_idx]
+        if confidence > best_conf[region_idx]:
+            best_conf[region_idx] = confidence
+            winner[region_idx] = box_idx
+    
+    return matched, winner
+
+
+if njit is not None:
+    @njit(cache=True, parallel=True)
+    def _assign_regions(centers, regions, mbr, confidences):
+        """
+        Numba-compiled equivalent of _assign_regions_numpy.
+        
+        Region lookup runs in parallel over boxes; the confidence-max pass is
+        sequential so ties keep the earliest box, as in the NumPy version.
+        """
+        n_boxes = centers.shape[0]
+        n_regions = regions.shape[0]
+        matched = np.full(n_boxes, -1, dtype=np.int64)
+        for i in prange(n_boxes):
+            x = centers[i, 0]
+            y = centers[i, 1]
+            if not (mbr[0] <= x <= mbr[2] and mbr[1] <= y <= mbr[3]):
+                continue
+            for j in range(n_regions):
+                if regions[j, 0] <= x <= regions[j, 2] and regions[j, 1] <= y <= regions[j, 3]:
+                    matched[i] = j
+                    break
+        
+        winner = np.full(n_regions, -1, dtype=np.int64)
+        best_conf = np.full(n_regions, -1.0)
+        for i in range(n_boxes):
+            j = matched[i]
+            if j >= 0 and confidences[i] > best_conf[j]:
+                best_conf[j] = confidences[i]
+                winner[j] = i
+        return matched, winner
+else:
+    _assign_regions = _assign_regions_numpy
+
+
 class BoxMapper:
     """
     Maps detected text boxes to structured field names.
@@ -30,8 +179,38 @@ class BoxMapper:
         self.config = config
         self.mapping_config = config.get('box_mapping', {})
         self.mode = self.mapping_config.get('mode', 'sequential')
+        self.refresh_regions()
         logger.info(f"BoxMapper initialized with mode: {self.mode}")
     
+    def refresh_regions(self):
+        """
+        Rebuild the cached positional regions from the mapping configuration.
+        
+        Call this after modifying 'positional_mapping' in the config at runtime.
+        Malformed regions (not exactly 4 values) are stored as NaN rows so
+        they never match any box.
+        """
+        positional_map = self.mapping_config.get('positional_mapping', {})
+        self._field_names = list(positional_map.keys())
+        self._regions = np.array([
+            positional_map[name].get('region', [])
+            if len(positional_map[name].get('region', [])) == 4
+            else [np.nan] * 4
+            for name in self._field_names
+        ], dtype=np.float64).reshape(-1, 4)
+        
+        # Bounding rectangle around all valid regions, used to reject boxes
+        # that cannot match anything before testing individual regions
+        valid = ~np.isnan(self._regions).any(axis=1)
+        if valid.any():
+            valid_regions = self._regions[valid]
+            self._global_mbr = np.array([
+                valid_regions[:, 0].min(), valid_regions[:, 1].min(),
+                valid_regions[:, 2].max(), valid_regions[:, 3].max()
+            ])
+        else:
+            self._global_mbr = np.full(4, np.nan)
+    
     def map_boxes_to_fields(self, boxes: List[Dict], image_width: Optional[int] = None, 
                            image_height: Optional[int] = None) -> Dict[str, any]:
         """
@@ -80,26 +259,28 @@ class BoxMapper:
         }
         
         # Map boxes to fields based on position in the list
-        for idx, box in enumerate(boxes):
-            if idx < len(fields):
-                field_name = fields[idx]
-                result['fields'][field_name] = {
-                    'text': box['text'],
-                    'confidence': box['confidence'],
-                    'box': box['box']
-                }
-                result['metadata']['mapped_fields'] += 1
-            else:
-                # Extra boxes that don't have a corresponding field
-                result['metadata']['unmapped_boxes'].append({
-                    'index': idx,
-                    'text': box['text'],
-                    'confidence': box['confidence']
-                })
-        
-        # Add any fields that weren't filled (not enough boxes detected)
-        for field in fields[len(boxes):]:
-            result['fields'][field] = None
+        n = min(len(fields), len(boxes))
+        mapped_boxes = boxes if n == len(boxes) else boxes[:n]
+        texts = [box['text'] for box in mapped_boxes]
+        confidences = [box['confidence'] for box in mapped_boxes]
+        field_boxes = [box['box'] for box in mapped_boxes]
+        
+        # Leave any fields that weren't filled empty (not enough boxes detected)
+        if n < len(fields):
+            missing = len(fields) - n
+            texts.extend([None] * missing)
+            confidences.extend([None] * missing)
+            field_boxes.extend([None] * missing)
+        
+        result['fields'] = MappedFields.from_columns(fields, texts, confidences, field_boxes)
+        result['metadata']['mapped_fields'] = n
+        
+        # Extra boxes that don't have a corresponding field
+        if n < len(boxes):
+            result['metadata']['unmapped_boxes'] = [
+                {'index': idx, 'text': box['text'], 'confidence': box['confidence']}
+                for idx, box in enumerate(islice(boxes, n, None), start=n)
+            ]
         
         logger.info(f"Sequential mapping: {result['metadata']['mapped_fields']} fields mapped")
         return result
@@ -120,7 +301,8 @@ class BoxMapper:
         Returns:
             Dictionary with field names and detected text
         """
-        positional_map = self.mapping_config.get('positional_mapping', {})
+        field_names = self._field_names
+        regions = self._regions
         result = {
             'fields': {},
             'metadata': {
@@ -131,45 +313,33 @@ class BoxMapper:
             }
         }
         
-        # Initialize all fields as None
-        for field_name in positional_map.keys():
-            result['fields'][field_name] = None
+        # Build box centers normalized to percentages
+        centers = np.array([
+            [box['position']['center_x'] / image_width,
+             box['position']['center_y'] / image_height]
+            for box in boxes
+        ], dtype=np.float64).reshape(-1, 2)
         
-        # Map each box to a field based on its position
-        for box_idx, box in enumerate(boxes):
-            center_x = box['position']['center_x']
-            center_y = box['position']['center_y']
-            
-            # Normalize coordinates to percentages
-            norm_x = center_x / image_width
-            norm_y = center_y / image_height
-            
-            # Check which region this box falls into
-            matched_field = None
-            for field_name, field_config in positional_map.items():
-                region = field_config.get('region', [])
-                if len(region) == 4:
-                    x_min, y_min, x_max, y_max = region
-                    if x_min <= norm_x <= x_max and y_min <= norm_y <= y_max:
-                        matched_field = field_name
-                        break
-            
-            if matched_field:
-                # If multiple boxes match the same field, keep the one with higher confidence
-                if result['fields'][matched_field] is None or \
-                   box['confidence'] > result['fields'][matched_field]['confidence']:
-                    result['fields'][matched_field] = {
-                        'text': box['text'],
-                        'confidence': box['confidence'],
-                        'box': box['box']
-                    }
-                    result['metadata']['mapped_fields'] += 1
-            else:
-                result['metadata']['unmapped_boxes'].append({
-                    'index': box_idx,
-                    'text': box['text'],
-                    'confidence': box['confidence']
-                })
+        confidences = np.array([box['confidence'] for box in boxes], dtype=np.float64)
+        
+        matched, winner = _assign_regions(centers, regions, self._global_mbr, confidences)
+        
+        # Fill each field from the highest-confidence box in its region;
+        # fields without a matching box stay None
+        winners = [boxes[box_idx] if box_idx >= 0 else None for box_idx in winner.tolist()]
+        result['fields'] = MappedFields.from_columns(
+            field_names,
+            [box['text'] if box is not None else None for box in winners],
+            [box['confidence'] if box is not None else None for box in winners],
+            [box['box'] if box is not None else None for box in winners]
+        )
+        result['metadata']['mapped_fields'] = int((winner >= 0).sum())
+        
+        result['metadata']['unmapped_boxes'] = [
+            {'index': int(box_idx), 'text': boxes[box_idx]['text'],
+             'confidence': boxes[box_idx]['confidence']}
+            for box_idx in np.flatnonzero(matched < 0)
+        ]
         
         logger.info(f"Positional mapping: {result['metadata']['mapped_fields']} fields mapped")
         return result
@@ -178,16 +348,15 @@ class BoxMapper:
         """
         Create a simplified output with just field names and text values.
         
+        Always returns a new dictionary, so callers may modify it freely.
+        
         Args:
             mapped_result: Full mapping result with metadata
             
         Returns:
             Simple dictionary with field names and text values
         """
-        simple = {}
-        for field_name, field_data in mapped_result['fields'].items():
-            if field_data is not None:
-                simple[field_name] = field_data['text']
-            else:
-                simple[field_name] = None
-        return simple
+        return {
+            field_name: field_data['text'] if field_data is not None else None
+            for field_name, field_data in mapped_result['fields'].items()
+        }
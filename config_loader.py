@@ -0,0 +1,55 @@
+"""
+Configuration Loading Module
+
+Loads the YAML configuration shared by the command-line application and
+the OCR engine's serve mode.
+"""
+
+import os
+import copy
+from typing import Dict, Tuple
+import logging
+import yaml
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    # libyaml bindings not available, use the pure-Python loader
+    from yaml import SafeLoader as _YamlLoader
+
+logger = logging.getLogger(__name__)
+
+# Parsed configuration files keyed by (absolute path, modification time)
+_CONFIG_CACHE: Dict[Tuple[str, float], Dict] = {}
+
+
+def load_config(config_path: str) -> Dict:
+    """
+    Load configuration from YAML file.
+    
+    Parsed files are cached per process and reused until the file's
+    modification time changes. Callers always receive a private copy.
+    
+    Args:
+        config_path: Path to config file
+        
+    Returns:
+        Configuration dictionary (empty if the file cannot be loaded)
+    """
+    try:
+        key = (os.path.abspath(config_path), os.path.getmtime(config_path))
+        cached = _CONFIG_CACHE.get(key)
+        if cached is not None:
+            logger.info(f"Loaded configuration from {config_path} (cached)")
+            return copy.deepcopy(cached)
+        
+        with open(config_path, 'r') as f:
+            config = yaml.load(f, Loader=_YamlLoader)
+        _CONFIG_CACHE[key] = config
+        logger.info(f"Loaded configuration from {config_path}")
+        return copy.deepcopy(config)
+    except FileNotFoundError:
+        logger.warning(f"Config file not found: {config_path}, using defaults")
+        return {}
+    except Exception as e:
+        logger.error(f"Failed to load config: {e}")
+        return {}
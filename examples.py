@@ -5,9 +5,29 @@ This script demonstrates how to use the PaddleOCR application
 programmatically instead of via command line.
 """
 
+import os
+import hashlib
+from typing import Iterator
+
 from main import OCRApplication
 from box_mapper import BoxMapper
 import json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def iter_pdfs(root: str) -> Iterator[str]:
+    """Lazily yield paths of PDF files directly inside a directory"""
+    if not os.path.isdir(root):
+        return
+    with os.scandir(root) as entries:
+        yield from (
+            entry.path for entry in entries
+            if entry.is_file() and entry.name.lower().endswith('.pdf')
+        )
+
 
 def example_basic_usage():
     """Basic usage example"""
@@ -77,17 +97,12 @@ def example_batch_processing():
     print("EXAMPLE 3: Batch Processing")
     print("=" * 60)
     
-    import os
-    from glob import glob
-    
     # Initialize once
     app = OCRApplication('config.yaml')
     
-    # Find all PDFs in a directory
-    pdf_files = glob('input_documents/*.pdf')
-    
+    # Stream PDFs from the directory instead of listing it up front
     all_results = []
-    for pdf_file in pdf_files:
+    for pdf_file in iter_pdfs('input_documents'):
         print(f"\nProcessing {pdf_file}...")
         try:
             results = app.process_file(
@@ -111,9 +126,9 @@ def example_batch_processing():
     # Summary
     successful = sum(1 for r in all_results if r['success'])
     print(f"\n\nBatch Summary:")
-    print(f"  Total files: {len(pdf_files)}")
+    print(f"  Total files: {len(all_results)}")
     print(f"  Successful: {successful}")
-    print(f"  Failed: {len(pdf_files) - successful}")
+    print(f"  Failed: {len(all_results) - successful}")
 
 
 def example_field_validation():
@@ -135,7 +150,7 @@ def example_field_validation():
         if not phone:
             return False
         # Remove common separators
-        digits = ''.join(c for c in phone if c.isdigit())
+        digits = ''.join(filter(str.isdigit, phone))
         return len(digits) >= 10
     
     # Validate extracted fields
@@ -166,6 +181,7 @@ def example_export_to_database():
     
     # Convert to database-ready format
     database_records = []
+    seen = set()  # Hashes of field sets already exported
     
     for page in results['pages']:
         simple_data = app.box_mapper.create_simple_output(page['mapped_result'])
@@ -182,11 +198,25 @@ def example_export_to_database():
             ) / len(page['filtered_boxes']) if page['filtered_boxes'] else 0
         }
         
+        # Skip pages whose extracted fields duplicate an earlier record
+        # (e.g. the same form scanned twice)
+        if orjson is not None:
+            fields_bytes = orjson.dumps(record['fields'], option=orjson.OPT_SORT_KEYS)
+        else:
+            fields_bytes = json.dumps(record['fields'], sort_keys=True).encode('utf-8')
+        fields_hash = hashlib.blake2b(fields_bytes, digest_size=16).hexdigest()
+        if fields_hash in seen:
+            continue
+        seen.add(fields_hash)
+        
         database_records.append(record)
     
     # Display what would be inserted
     print("\nDatabase records prepared:")
-    print(json.dumps(database_records, indent=2))
+    if orjson is not None:
+        print(orjson.dumps(database_records, option=orjson.OPT_INDENT_2).decode())
+    else:
+        print(json.dumps(database_records, indent=2))
     
     # In a real application, you would insert into database:
     # db.insert_many(database_records)
@@ -16,13 +16,19 @@ Example:
 
 import os
 import sys
+import time
+import queue
+import threading
 import argparse
-import yaml
 import logging
-from typing import Dict, List
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 from colorama import init, Fore, Style
 
 # Import local modules
+from config_loader import load_config
 from ocr_engine import OCREngine
 from pdf_processor import PDFProcessor
 from box_mapper import BoxMapper
@@ -39,6 +45,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Application instance owned by a page worker process (see _init_page_worker)
+_WORKER_APP = None
+
+
+def _init_page_worker(config: Dict):
+    """
+    Build the OCR application once per worker process.
+    
+    Args:
+        config: Configuration dictionary of the parent application
+    """
+    global _WORKER_APP
+    _WORKER_APP = OCRApplication(config=config)
+
+
+def _process_page_in_worker(args: Tuple) -> Optional[Dict]:
+    """
+    Process a single page in a worker process.
+    
+    Args:
+        args: Positional arguments for OCRApplication._process_single_page
+        
+    Returns:
+        Page result dictionary, or None if no text was detected
+    """
+    try:
+        page_result = _WORKER_APP._process_single_page(*args)
+    except Exception:
+        _WORKER_APP.visualizer.flush(raise_errors=False)
+        raise
+    # Visualizations must be on disk before the parent sees the result
+    _WORKER_APP.visualizer.flush()
+    return page_result
+
 
 class OCRApplication:
     """
@@ -48,18 +88,19 @@ class OCRApplication:
     visualization, and output generation.
     """
     
-    def __init__(self, config_path: str = 'config.yaml'):
+    def __init__(self, config_path: str = 'config.yaml', config: Optional[Dict] = None):
         """
         Initialize the OCR application.
         
         Args:
             config_path: Path to configuration YAML file
+            config: Already loaded configuration; takes precedence over config_path
         """
-        self.config = self._load_config(config_path)
+        self.config = config if config is not None else self._load_config(config_path)
         
         # Initialize components
         logger.info("Initializing OCR application...")
-        self.ocr_engine = OCREngine(self.config)
+        self.ocr_engine = OCREngine.get(self.config)
         self.pdf_processor = PDFProcessor(self.config)
         self.box_mapper = BoxMapper(self.config)
         self.visualizer = Visualizer(self.config)
@@ -77,20 +118,19 @@ class OCRApplication:
         Returns:
             Configuration dictionary
         """
-        try:
-            with open(config_path, 'r') as f:
-                config = yaml.safe_load(f)
-            logger.info(f"Loaded configuration from {config_path}")
-            return config
-        except FileNotFoundError:
-            logger.warning(f"Config file not found: {config_path}, using defaults")
-            return {}
-        except Exception as e:
-            logger.error(f"Failed to load config: {e}")
-            return {}
+        return load_config(config_path)
+    
+    def close(self):
+        """
+        Release background resources (pending visualization writes).
+        
+        Call once the application is no longer needed.
+        """
+        self.visualizer.close()
     
     def process_file(self, file_path: str, min_confidence: float = 0.5, 
-                    save_visualization: bool = True) -> Dict:
+                    save_visualization: bool = True, keep_raw: Optional[bool] = None,
+                    keep_pages: bool = True) -> Dict:
         """
         Process a PDF or image file with OCR.
         
@@ -102,10 +142,18 @@ class OCRApplication:
         5. Generate visualizations
         6. Save results
         
+        Pages are processed one at a time and written to the output files as
+        soon as they are done, so memory use does not grow with page count
+        unless the page results are kept for the return value.
+        
         Args:
             file_path: Path to the input file (PDF or image)
             min_confidence: Minimum confidence threshold for text detection
             save_visualization: Whether to save visualization images
+            keep_raw: Whether to include unfiltered OCR boxes ('raw_boxes')
+                     in each page result (default: output.keep_raw_boxes)
+            keep_pages: Whether to return full page results. If False, 'pages'
+                       only holds the per-page summaries.
             
         Returns:
             Dictionary containing complete results
@@ -117,144 +165,432 @@ class OCRApplication:
         print(f"{Fore.CYAN}Processing: {Fore.WHITE}{file_path}")
         print(f"{Fore.CYAN}{'='*60}\n")
         
+        if keep_raw is None:
+            keep_raw = self.config.get('output', {}).get('keep_raw_boxes', False)
+        
         # Check if input is PDF or image
         is_pdf = self.pdf_processor.is_pdf(file_path)
         temp_images = []
         
+        runtime_config = self.config.get('runtime', {})
+        pipelined = (is_pdf and runtime_config.get('pipeline', True)
+                     and self._worker_count() <= 1)
+        
         try:
-            if is_pdf:
-                print(f"{Fore.YELLOW}📄 Converting PDF to images...")
-                image_paths = self.pdf_processor.convert_pdf_to_images(file_path)
-                temp_images = image_paths  # Track for cleanup
-            else:
-                image_paths = [file_path]
-            
-            # Process each page/image
-            all_results = []
-            for page_num, image_path in enumerate(image_paths, start=1):
-                print(f"\n{Fore.GREEN}📝 Processing page {page_num}/{len(image_paths)}...")
-                
-                # Run OCR
-                raw_boxes = self.ocr_engine.process_image(image_path)
-                
-                if not raw_boxes:
-                    print(f"{Fore.RED}⚠️  No text detected on page {page_num}")
-                    continue
-                
-                # Filter by confidence
-                filtered_boxes = self.ocr_engine.filter_boxes_by_confidence(
-                    raw_boxes, min_confidence
+            if pipelined:
+                # Rasterize, OCR and output run concurrently (see _iter_pdf_pipelined)
+                first_page, last_page = self.pdf_processor.get_page_range(file_path)
+                total_pages = last_page - first_page + 1
+                pages = self._iter_pdf_pipelined(
+                    file_path, total_pages, min_confidence, save_visualization, keep_raw
                 )
-                
-                # Sort boxes in reading order
-                sorted_boxes = self.ocr_engine.sort_boxes_reading_order(filtered_boxes)
-                
-                print(f"{Fore.GREEN}✓ Detected {len(sorted_boxes)} text regions")
-                
-                # Map boxes to fields
-                width, height = self.pdf_processor.get_image_dimensions(image_path)
-                mapped_result = self.box_mapper.map_boxes_to_fields(
-                    sorted_boxes, width, height
+            else:
+                if is_pdf:
+                    print(f"{Fore.YELLOW}📄 Converting PDF to images...")
+                    image_paths = self.pdf_processor.convert_pdf_to_images(file_path)
+                    temp_images = image_paths  # Track for cleanup
+                else:
+                    image_paths = [file_path]
+                total_pages = len(image_paths)
+                pages = self.iter_pages(
+                    file_path, image_paths, min_confidence, save_visualization, keep_raw
                 )
-                
-                print(f"{Fore.GREEN}✓ Mapped {mapped_result['metadata']['mapped_fields']} fields")
-                
-                # Create visualization if requested
-                viz_path = None
-                field_viz_path = None
-                if save_visualization:
-                    base_name = os.path.splitext(os.path.basename(file_path))[0]
-                    output_dir = self.config.get('output', {}).get('output_dir', 'output')
-                    
-                    viz_path = os.path.join(
-                        output_dir,
-                        f"{base_name}_page_{page_num}_boxes.png"
-                    )
-                    field_viz_path = os.path.join(
-                        output_dir,
-                        f"{base_name}_page_{page_num}_fields.png"
-                    )
-                    
-                    print(f"{Fore.YELLOW}🎨 Creating visualizations...")
-                    self.visualizer.draw_boxes(image_path, sorted_boxes, viz_path)
-                    self.visualizer.create_field_visualization(
-                        image_path, mapped_result, field_viz_path
-                    )
-                
-                # Collect results for this page
-                page_result = {
-                    'page_number': page_num,
-                    'image_path': image_path,
-                    'raw_boxes': raw_boxes,
-                    'filtered_boxes': filtered_boxes,
-                    'mapped_result': mapped_result,
-                    'visualization_path': viz_path,
-                    'field_visualization_path': field_viz_path
-                }
-                all_results.append(page_result)
             
-            # Compile final results
-            final_result = {
+            header = {
                 'input_file': file_path,
                 'is_pdf': is_pdf,
-                'total_pages': len(image_paths),
-                'pages': all_results,
+                'total_pages': total_pages,
                 'config': {
                     'min_confidence': min_confidence,
                     'mapping_mode': self.config.get('box_mapping', {}).get('mode', 'sequential')
                 }
             }
+            base_name = os.path.splitext(os.path.basename(file_path))[0]
+            self.output_manager.begin_results(base_name, header)
+            
+            # Stream each page straight to the output files
+            all_results = []
+            summaries = []
+            for page_result in pages:
+                self.output_manager.save_page(page_result)
+                summaries.append(self._summarize_page(page_result))
+                if keep_pages:
+                    all_results.append(page_result)
             
             # Save results
             print(f"\n{Fore.YELLOW}💾 Saving results...")
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
-            saved_files = self.output_manager.save_results(final_result, base_name)
+            saved_files = self.output_manager.end_results()
+            self.visualizer.flush()
             
             # Print summary
-            self._print_summary(final_result, saved_files)
+            self._print_summary(summaries, saved_files)
             
+            # Compile final results
+            final_result = dict(header)
+            final_result['pages'] = all_results if keep_pages else summaries
             return final_result
             
         finally:
+            self.output_manager.close_results()
+            # Finish (and log) visualization writes left pending by an error
+            self.visualizer.flush(raise_errors=False)
+            
             # Cleanup temporary images
             if temp_images and is_pdf:
                 logger.info("Cleaning up temporary images...")
                 self.pdf_processor.cleanup_temp_images(temp_images)
     
-    def _print_summary(self, results: Dict, saved_files: Dict):
+    def iter_pages(self, file_path: str, image_paths: List[str], min_confidence: float = 0.5,
+                   save_visualization: bool = True, keep_raw: bool = False) -> Iterator[Dict]:
+        """
+        Run OCR, filtering, mapping and visualization page by page.
+        
+        With 'runtime.workers' > 1 pages are processed in parallel worker
+        processes, each with its own OCR engine. Results are still yielded
+        in page order.
+        
+        Args:
+            file_path: Path to the original input file (used for output names)
+            image_paths: Paths to the page images, in page order
+            min_confidence: Minimum confidence threshold for text detection
+            save_visualization: Whether to save visualization images
+            keep_raw: Whether to include unfiltered OCR boxes in the page result
+            
+        Yields:
+            Result dictionary for each page where text was detected
+        """
+        total_pages = len(image_paths)
+        page_args = [
+            (file_path, page_num, total_pages, image_path,
+             min_confidence, save_visualization, keep_raw)
+            for page_num, image_path in enumerate(image_paths, start=1)
+        ]
+        
+        workers = min(self._worker_count(), total_pages)
+        
+        if workers <= 1:
+            # Run OCR on several pages per engine call, then finish each page
+            batch_size = self.ocr_engine.batch_size
+            for start in range(0, total_pages, batch_size):
+                batch_args = page_args[start:start + batch_size]
+                # Decode each page once for both OCR and visualization;
+                # unreadable files are passed on as paths
+                images = [self.ocr_engine.decode_image(args[3]) for args in batch_args]
+                raw_batches = self.ocr_engine.process_images(
+                    [args[3] for args in batch_args],
+                    images=[img if img is not None else args[3]
+                            for args, img in zip(batch_args, images)]
+                )
+                for args, raw_boxes, img in zip(batch_args, raw_batches, images):
+                    page_result = self._process_single_page(
+                        *args, raw_boxes=raw_boxes, image=img
+                    )
+                    if page_result is not None:
+                        yield page_result
+            return
+        
+        # PaddleOCR is not fork-safe, so workers are spawned and build
+        # their own engine from the config
+        logger.info(f"Processing {total_pages} pages with {workers} workers")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_page_worker,
+            initargs=(self.config,)
+        ) as executor:
+            for page_result in executor.map(_process_page_in_worker, page_args):
+                if page_result is not None:
+                    yield page_result
+    
+    def _worker_count(self) -> int:
+        """
+        Get the configured number of page worker processes.
+        
+        Returns:
+            Value of 'runtime.workers' (null means one per CPU core)
+        """
+        return self.config.get('runtime', {}).get('workers', 1) or os.cpu_count()
+    
+    def _iter_pdf_pipelined(self, file_path: str, total_pages: int, min_confidence: float,
+                            save_visualization: bool, keep_raw: bool) -> Iterator[Dict]:
+        """
+        Process a PDF with rasterization, OCR and output running concurrently.
+        
+        Three stages are connected by bounded queues:
+        1. A rasterizer thread renders pages a few at a time (pages stay in
+           memory; nothing is written to disk)
+        2. An OCR thread collects pages into batches, dispatching a batch when
+           it is full or 'runtime.max_wait_ms' has passed since its first page
+        3. The caller consumes the yielded pages (filter, map, visualize, save)
+        
+        Args:
+            file_path: Path to the PDF file
+            total_pages: Number of pages that will be processed
+            min_confidence: Minimum confidence threshold for text detection
+            save_visualization: Whether to save visualization images
+            keep_raw: Whether to include unfiltered OCR boxes in the page result
+            
+        Yields:
+            Result dictionary for each page where text was detected
+        """
+        batch_size = max(1, self.ocr_engine.batch_size)
+        max_wait = self.config.get('runtime', {}).get('max_wait_ms', 50) / 1000.0
+        
+        # Bounded queues keep only a few pages in memory at a time
+        det_queue = queue.Queue(maxsize=2 * batch_size)
+        save_queue = queue.Queue(maxsize=2 * batch_size)
+        stop = threading.Event()
+        errors = []
+        
+        # Queue operations give up once the pipeline is stopped, so a stage
+        # that failed or exited early can never leave another one blocked
+        def put(q, item) -> bool:
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def get(q):
+            while True:
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        return None
+        
+        def rasterize():
+            try:
+                print(f"{Fore.YELLOW}📄 Rasterizing PDF pages...")
+                for page_num, image in self.pdf_processor.stream_pages(file_path):
+                    array = self.pdf_processor.to_bgr_array(image)
+                    if not put(det_queue, (page_num, array)):
+                        break
+            except Exception as e:
+                errors.append(e)
+            finally:
+                put(det_queue, None)
+        
+        def run_ocr():
+            try:
+                finished = False
+                while not finished:
+                    item = get(det_queue)
+                    if item is None:
+                        break
+                    
+                    # Dynamic batching: flush on batch size or timeout
+                    batch = [item]
+                    deadline = time.monotonic() + max_wait
+                    while len(batch) < batch_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        try:
+                            item = det_queue.get(timeout=remaining)
+                        except queue.Empty:
+                            break
+                        if item is None:
+                            finished = True
+                            break
+                        batch.append(item)
+                    
+                    if stop.is_set():
+                        break
+                    raw_batches = self.ocr_engine.process_images(
+                        [f"{file_path} (page {page_num})" for page_num, _ in batch],
+                        images=[array for _, array in batch]
+                    )
+                    for (page_num, array), raw_boxes in zip(batch, raw_batches):
+                        if not put(save_queue, (page_num, array, raw_boxes)):
+                            break
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                put(save_queue, None)
+        
+        threads = [
+            threading.Thread(target=rasterize, name='pdf-rasterize', daemon=True),
+            threading.Thread(target=run_ocr, name='pdf-ocr', daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+        
+        try:
+            while True:
+                item = get(save_queue)
+                if item is None:
+                    break
+                page_num, array, raw_boxes = item
+                page_result = self._process_single_page(
+                    file_path, page_num, total_pages, None, min_confidence,
+                    save_visualization, keep_raw, raw_boxes=raw_boxes, image=array
+                )
+                if page_result is not None:
+                    yield page_result
+        finally:
+            # Stop the producers if the consumer exits early or a stage failed;
+            # their queue operations notice within a poll interval
+            stop.set()
+            for thread in threads:
+                thread.join()
+        
+        if errors:
+            raise errors[0]
+    
+    def _process_single_page(self, file_path: str, page_num: int, total_pages: int,
+                             image_path: Optional[str], min_confidence: float,
+                             save_visualization: bool, keep_raw: bool,
+                             raw_boxes: Optional[List[Dict]] = None,
+                             image: Optional[np.ndarray] = None) -> Optional[Dict]:
+        """
+        Run OCR, filtering, mapping and visualization for one page.
+        
+        Args:
+            file_path: Path to the original input file (used for output names)
+            page_num: 1-based page number
+            total_pages: Number of pages in the document
+            image_path: Path to the page image (None if only held in memory)
+            min_confidence: Minimum confidence threshold for text detection
+            save_visualization: Whether to save visualization images
+            keep_raw: Whether to include unfiltered OCR boxes in the page result
+            raw_boxes: OCR output for the page if already computed (e.g. batched)
+            image: Decoded page image, if already in memory (reused for the
+                  visualizations and not valid afterwards)
+            
+        Returns:
+            Page result dictionary, or None if no text was detected
+        """
+        print(f"\n{Fore.GREEN}📝 Processing page {page_num}/{total_pages}...")
+        
+        # Run OCR
+        if raw_boxes is None:
+            if image is None:
+                # Decode once for OCR and visualization (None if unreadable)
+                image = self.ocr_engine.decode_image(image_path)
+            raw_boxes = self.ocr_engine.process_image(image if image is not None else image_path)
+        
+        if not raw_boxes:
+            print(f"{Fore.RED}⚠️  No text detected on page {page_num}")
+            return None
+        
+        # Filter by confidence
+        filtered_boxes = self.ocr_engine.filter_boxes_by_confidence(
+            raw_boxes, min_confidence
+        )
+        
+        # Sort boxes in reading order
+        sorted_boxes = self.ocr_engine.sort_boxes_reading_order(filtered_boxes)
+        
+        print(f"{Fore.GREEN}✓ Detected {len(sorted_boxes)} text regions")
+        
+        # Map boxes to fields
+        if image is not None:
+            height, width = image.shape[:2]
+        else:
+            width, height = self.pdf_processor.get_image_dimensions(image_path)
+        mapped_result = self.box_mapper.map_boxes_to_fields(
+            sorted_boxes, width, height
+        )
+        
+        print(f"{Fore.GREEN}✓ Mapped {mapped_result['metadata']['mapped_fields']} fields")
+        
+        # Create visualization if requested
+        viz_path = None
+        field_viz_path = None
+        if save_visualization:
+            base_name = os.path.splitext(os.path.basename(file_path))[0]
+            output_dir = self.config.get('output', {}).get('output_dir', 'output')
+            
+            viz_path = os.path.join(
+                output_dir,
+                f"{base_name}_page_{page_num}_boxes.png"
+            )
+            field_viz_path = os.path.join(
+                output_dir,
+                f"{base_name}_page_{page_num}_fields.png"
+            )
+            
+            print(f"{Fore.YELLOW}🎨 Creating visualizations...")
+            source = image if image is not None else image_path
+            self.visualizer.draw_boxes(source, sorted_boxes, viz_path)
+            # Last use of the page image, so draw on it directly
+            self.visualizer.create_field_visualization(
+                source, mapped_result, field_viz_path, inplace=True
+            )
+        
+        # Collect results for this page
+        page_result = {
+            'page_number': page_num,
+            'image_path': image_path,
+            'filtered_boxes': filtered_boxes,
+            'mapped_result': mapped_result,
+            'visualization_path': viz_path,
+            'field_visualization_path': field_viz_path
+        }
+        if keep_raw:
+            page_result['raw_boxes'] = raw_boxes
+        return page_result
+    
+    def _summarize_page(self, page_result: Dict) -> Dict:
+        """
+        Reduce a page result to the values shown in the results summary.
+        
+        Args:
+            page_result: Result dictionary for one page
+            
+        Returns:
+            Dictionary with page number, box/field counts and extracted values
+        """
+        mapped = page_result['mapped_result']
+        return {
+            'page_number': page_result['page_number'],
+            'total_boxes': mapped['metadata']['total_boxes'],
+            'mapped_fields': mapped['metadata']['mapped_fields'],
+            'fields': self.box_mapper.create_simple_output(mapped)
+        }
+    
+    def _print_summary(self, summaries: List[Dict], saved_files: Dict):
         """
         Print a summary of the OCR results.
         
         Args:
-            results: Complete results dictionary
+            summaries: Per-page summaries from _summarize_page
             saved_files: Dictionary of saved file paths
         """
-        print(f"\n{Fore.CYAN}{'='*60}")
-        print(f"{Fore.CYAN}RESULTS SUMMARY")
-        print(f"{Fore.CYAN}{'='*60}\n")
+        # Build the whole summary and write it at once instead of issuing
+        # a separate (colorama-wrapped) write per line
+        lines = [
+            f"\n{Fore.CYAN}{'='*60}",
+            f"{Fore.CYAN}RESULTS SUMMARY",
+            f"{Fore.CYAN}{'='*60}\n",
+        ]
         
-        for page in results['pages']:
-            page_num = page['page_number']
-            mapped = page['mapped_result']
-            
-            print(f"{Fore.GREEN}Page {page_num}:")
-            print(f"{Fore.WHITE}  Detected boxes: {mapped['metadata']['total_boxes']}")
-            print(f"{Fore.WHITE}  Mapped fields: {mapped['metadata']['mapped_fields']}")
-            print(f"\n{Fore.YELLOW}  Extracted Data:")
+        for summary in summaries:
+            lines.append(f"{Fore.GREEN}Page {summary['page_number']}:")
+            lines.append(f"{Fore.WHITE}  Detected boxes: {summary['total_boxes']}")
+            lines.append(f"{Fore.WHITE}  Mapped fields: {summary['mapped_fields']}")
+            lines.append(f"\n{Fore.YELLOW}  Extracted Data:")
             
-            simple_data = self.box_mapper.create_simple_output(mapped)
-            for field_name, value in simple_data.items():
+            for field_name, value in summary['fields'].items():
                 if value:
-                    print(f"{Fore.WHITE}    {field_name}: {Fore.GREEN}{value}")
+                    lines.append(f"{Fore.WHITE}    {field_name}: {Fore.GREEN}{value}")
                 else:
-                    print(f"{Fore.WHITE}    {field_name}: {Fore.RED}[Not detected]")
-            print()
+                    lines.append(f"{Fore.WHITE}    {field_name}: {Fore.RED}[Not detected]")
+            lines.append("")
         
-        print(f"{Fore.CYAN}Output files:")
+        lines.append(f"{Fore.CYAN}Output files:")
         for file_type, file_path in saved_files.items():
-            print(f"{Fore.WHITE}  {file_type}: {Fore.GREEN}{file_path}")
+            lines.append(f"{Fore.WHITE}  {file_type}: {Fore.GREEN}{file_path}")
+        
+        lines.append(f"\n{Fore.GREEN}✓ Processing complete!\n")
         
-        print(f"\n{Fore.GREEN}✓ Processing complete!\n")
+        # Reset colors at the end of every line, as print() with autoreset did
+        sys.stdout.write(f"{Style.RESET_ALL}\n".join(lines) + f"{Style.RESET_ALL}\n")
+        sys.stdout.flush()
 
 
 def main():
@@ -309,6 +645,7 @@ Examples:
     # Set logging level
     logging.getLogger().setLevel(getattr(logging, args.log_level))
     
+    app = None
     try:
         # Initialize and run application
         app = OCRApplication(args.config)
@@ -325,6 +662,9 @@ Examples:
         print(f"\n{Fore.RED}❌ Error: {str(e)}")
         logger.exception("Application error")
         sys.exit(1)
+    finally:
+        if app is not None:
+            app.close()
 
 
 if __name__ == '__main__':
@@ -5,16 +5,99 @@ This module provides the core OCR functionality using PaddlePaddle's OCR engine.
 It handles text detection, recognition, and bounding box extraction from images.
 """
 
+import io
 import os
-from typing import List, Dict, Tuple, Optional
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+from typing import List, Dict, Tuple, Optional, Union
 import numpy as np
+import cv2
+from PIL import Image
 from paddleocr import PaddleOCR
 import logging
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+except ImportError:
+    TurboJPEG = None
+
+from config_loader import load_config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Initialized engines keyed by their serialized OCR configuration
+_engine_cache: Dict[str, 'OCREngine'] = {}
+
+# Shared libjpeg-turbo decoder (created on first use, False if unavailable)
+_turbo_jpeg = None
+
+
+def _quantize_model_dir(model_dir: str) -> str:
+    """
+    Create an INT8 copy of an exported Paddle inference model.
+    
+    The model is converted to ONNX with paddle2onnx and its weights are
+    quantized with ONNX Runtime's quantize_dynamic. The result is stored
+    next to the original as '<model_dir>_int8' (the Paddle files are copied
+    too, so the directory still works without ONNX Runtime) and reused on
+    later runs. It is built in a temporary directory and renamed into
+    place, so concurrent processes never see a partially written model.
+    
+    Args:
+        model_dir: Directory containing inference.pdmodel/.json and inference.pdiparams
+        
+    Returns:
+        Path to the quantized model directory
+    """
+    model_dir = os.path.normpath(model_dir)
+    quantized_dir = f"{model_dir}_int8"
+    onnx_path = os.path.join(quantized_dir, 'inference.onnx')
+    if os.path.exists(onnx_path):
+        return quantized_dir
+    
+    # Imported here: only needed for the one-time conversion
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    
+    model_filename = next(
+        (name for name in ('inference.json', 'inference.pdmodel')
+         if os.path.exists(os.path.join(model_dir, name))),
+        None
+    )
+    if model_filename is None:
+        raise FileNotFoundError(f"No Paddle inference model found in {model_dir}")
+    
+    logger.info(f"Quantizing {model_dir} to INT8 (one-time conversion)...")
+    work_dir = tempfile.mkdtemp(
+        prefix=f"{os.path.basename(quantized_dir)}.tmp",
+        dir=os.path.dirname(quantized_dir) or '.'
+    )
+    try:
+        build_dir = os.path.join(work_dir, 'model')
+        shutil.copytree(model_dir, build_dir)
+        fp32_path = os.path.join(work_dir, 'inference_fp32.onnx')
+        subprocess.run(
+            ['paddle2onnx', '--model_dir', model_dir,
+             '--model_filename', model_filename,
+             '--params_filename', 'inference.pdiparams',
+             '--save_file', fp32_path],
+            check=True, capture_output=True
+        )
+        quantize_dynamic(fp32_path, os.path.join(build_dir, 'inference.onnx'),
+                         weight_type=QuantType.QInt8)
+        try:
+            os.replace(build_dir, quantized_dir)
+        except OSError:
+            # Another process finished first; use its copy
+            if not os.path.exists(onnx_path):
+                raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return quantized_dir
+
 
 class OCREngine:
     """
@@ -42,67 +125,342 @@ class OCREngine:
         use_gpu = ocr_config.get('use_gpu', False)
         device = 'gpu' if use_gpu else 'cpu'
         
+        # Number of images per PaddleOCR call in process_images
+        self.batch_size = ocr_config.get('batch_size', 4)
+        # Longest image side fed to the detector (larger images are downscaled)
+        self.max_side = ocr_config.get('max_side', 1600)
+        
         # Use simplified initialization to avoid segfaults on some systems
         # Disable doc analysis which can cause issues on macOS
+        ocr_kwargs = dict(
+            lang=ocr_config.get('lang', 'en'),
+            device=device,
+            use_angle_cls=False,  # Disable to avoid segfault
+            det_db_thresh=ocr_config.get('det_db_thresh', 0.3),
+            det_db_box_thresh=ocr_config.get('det_db_box_thresh', 0.6),
+            rec_batch_num=ocr_config.get('rec_batch_num', 6)
+        )
+        
+        model_dirs = {
+            key: ocr_config.get(key)
+            for key in ('det_model_dir', 'rec_model_dir')
+            if ocr_config.get(key)
+        }
+        quantize = ocr_config.get('quantize') or 'none'
+        if quantize == 'int8':
+            try:
+                model_dirs = {key: _quantize_model_dir(path) for key, path in model_dirs.items()}
+            except Exception as e:
+                logger.warning(f"INT8 quantization failed, using original models: {e}")
+            else:
+                if model_dirs:
+                    # Quantized ONNX models run on the ONNX Runtime HPI backend
+                    ocr_config = dict(ocr_config, enable_hpi=True, hpi_backend='onnxruntime')
+                else:
+                    logger.warning("INT8 quantization needs det_model_dir/rec_model_dir, "
+                                   "using original models")
+        elif quantize == 'fp16':
+            ocr_config = dict(ocr_config, precision='fp16')
+        ocr_kwargs.update(model_dirs)
+        
+        # Precision is only applied by high-performance inference
+        if quantize == 'fp16' and not ocr_config.get('enable_hpi', False):
+            logger.warning("quantize: fp16 requires enable_hpi; running at default precision")
+        
         try:
-            self.ocr = PaddleOCR(
-                lang=ocr_config.get('lang', 'en'),
-                device=device,
-                use_angle_cls=False,  # Disable to avoid segfault
-                det_db_thresh=ocr_config.get('det_db_thresh', 0.3),
-                det_db_box_thresh=ocr_config.get('det_db_box_thresh', 0.6),
-                rec_batch_num=ocr_config.get('rec_batch_num', 6)
-            )
+            self.ocr = None
+            if ocr_config.get('enable_hpi', False):
+                # High-performance inference picks an optimized backend
+                # (TensorRT on GPU, OpenVINO/ONNX Runtime on CPU); it needs
+                # extra dependencies, so fall back to the default backend
+                try:
+                    self.ocr = PaddleOCR(**ocr_kwargs, **self._hpi_kwargs(ocr_config, use_gpu))
+                    logger.info("High-performance inference enabled")
+                except Exception as e:
+                    logger.warning(f"High-performance inference unavailable, using default backend: {e}")
+                    if quantize != 'none':
+                        logger.warning(f"quantize: {quantize} is not applied without "
+                                       f"high-performance inference")
+            if self.ocr is None:
+                self.ocr = PaddleOCR(**ocr_kwargs)
             logger.info("OCR engine initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize PaddleOCR: {e}")
             raise
+        
+        if ocr_config.get('warmup', True):
+            self._warmup()
+    
+    @classmethod
+    def get(cls, config: Dict) -> 'OCREngine':
+        """
+        Return a shared engine for the given configuration.
+        
+        Loading the models is the most expensive step of a run, so engines
+        are kept for the lifetime of the process and reused whenever the
+        OCR section of the configuration matches.
+        
+        Args:
+            config: Dictionary containing OCR configuration parameters
+            
+        Returns:
+            Initialized OCREngine
+        """
+        key = json.dumps(config.get('ocr', {}), sort_keys=True, default=str)
+        engine = _engine_cache.get(key)
+        if engine is None:
+            engine = _engine_cache[key] = cls(config)
+        return engine
     
-    def process_image(self, image_path: str) -> List[Dict]:
+    def _warmup(self):
+        """
+        Run one inference on a blank image.
+        
+        The first call triggers kernel selection and any graph compilation,
+        so doing it here keeps that cost out of the first real page.
+        """
+        try:
+            self.ocr.ocr(np.zeros((320, 320, 3), dtype=np.uint8))
+        except Exception as e:
+            logger.warning(f"OCR warmup failed: {e}")
+    
+    @staticmethod
+    def _hpi_kwargs(ocr_config: Dict, use_gpu: bool) -> Dict:
+        """
+        Build PaddleOCR arguments for high-performance inference.
+        
+        Args:
+            ocr_config: OCR section of the configuration
+            use_gpu: Whether inference runs on GPU
+            
+        Returns:
+            Keyword arguments to pass to PaddleOCR
+        """
+        kwargs = {
+            'enable_hpi': True,
+            'precision': ocr_config.get('precision') or ('fp16' if use_gpu else 'fp32')
+        }
+        backend = ocr_config.get('hpi_backend', 'auto')
+        if backend and backend != 'auto':
+            # Explicit backend, e.g. 'tensorrt', 'openvino' or 'onnxruntime'
+            kwargs['hpi_config'] = {'auto_config': False, 'backend': backend}
+        return kwargs
+    
+    def process_image(self, image: Union[str, np.ndarray]) -> List[Dict]:
         """
         Process an image and extract text with bounding boxes.
         
         Args:
-            image_path: Path to the image file
+            image: Path to the image file, or an already decoded BGR image array
             
         Returns:
             List of dictionaries containing bounding box and text information
             Each dict has: 'box', 'text', 'confidence', 'position'
         """
-        logger.info(f"Processing image: {image_path}")
+        source = image if isinstance(image, str) else f"in-memory image {image.shape}"
+        logger.info(f"Processing image: {source}")
+        image, scale = self._downscale(image)
         
         # Perform OCR on the image
         # Result format: [[[box], (text, confidence)], ...]
         # Note: cls parameter removed in newer PaddleOCR versions
-        result = self.ocr.ocr(image_path)
+        result = self.ocr.ocr(image)
+        
+        return self._structure_results(result[0] if result else None, source, scale)
+    
+    def _downscale(self, image: Union[str, np.ndarray]) -> Tuple[Union[str, np.ndarray], float]:
+        """
+        Shrink an image so its longest side is at most 'max_side' pixels.
+        
+        Detection time grows with the pixel count, and 300 DPI pages carry
+        far more resolution than the models need.
+        
+        Args:
+            image: Path to the image file, or a decoded BGR image array
+            
+        Returns:
+            Tuple of (image to pass to PaddleOCR, scale factor applied)
+        """
+        if isinstance(image, str):
+            decoded = self.decode_image(image)
+            if decoded is None:
+                # Let PaddleOCR deal with formats OpenCV cannot read
+                return image, 1.0
+            image = decoded
+        
+        if not self.max_side:
+            return image, 1.0
         
-        if not result or not result[0]:
-            logger.warning(f"No text detected in {image_path}")
+        height, width = image.shape[:2]
+        scale = min(1.0, self.max_side / max(height, width))
+        if scale < 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return image, scale
+    
+    @staticmethod
+    def decode_image(image_path: str) -> Optional[np.ndarray]:
+        """
+        Decode an image file into a BGR array.
+        
+        JPEG files are decoded with libjpeg-turbo when PyTurboJPEG is
+        installed, unless their EXIF data asks for a rotation; those and
+        everything else go through OpenCV, which applies the EXIF
+        orientation like cv2.imread does. Reading the bytes
+        with NumPy also handles non-ASCII paths, which cv2.imread does not
+        on Windows.
+        
+        Args:
+            image_path: Path to the image file
+            
+        Returns:
+            BGR image array, or None if the file cannot be read or decoded
+        """
+        global _turbo_jpeg
+        try:
+            data = np.fromfile(image_path, dtype=np.uint8)
+        except OSError:
+            return None
+        
+        if TurboJPEG is not None and image_path.lower().endswith(('.jpg', '.jpeg')):
+            if _turbo_jpeg is None:
+                try:
+                    _turbo_jpeg = TurboJPEG()
+                except Exception as e:
+                    logger.warning(f"libjpeg-turbo unavailable, using OpenCV for JPEG: {e}")
+                    _turbo_jpeg = False
+            if _turbo_jpeg and OCREngine._exif_orientation(data) == 1:
+                try:
+                    return _turbo_jpeg.decode(data.tobytes(), pixel_format=TJPF_BGR)
+                except Exception as e:
+                    logger.debug(f"TurboJPEG could not decode {image_path} ({e}), using OpenCV")
+        
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
+    
+    @staticmethod
+    def _exif_orientation(data: np.ndarray) -> int:
+        """
+        Read the EXIF orientation of an encoded image.
+        
+        Only the file header is parsed; the pixels are not decoded.
+        
+        Args:
+            data: Encoded image bytes
+            
+        Returns:
+            EXIF Orientation value (1 = upright, also if the tag is missing)
+        """
+        try:
+            with Image.open(io.BytesIO(data.tobytes())) as image:
+                return image.getexif().get(0x0112, 1)
+        except Exception:
+            return 1
+    
+    def process_images(self, image_paths: List[str], batch_size: Optional[int] = None,
+                       images: Optional[List[Union[str, np.ndarray]]] = None) -> List[List[Dict]]:
+        """
+        Process several images, running OCR on batches of images at once.
+        
+        Batching amortizes PaddleOCR's fixed per-call overhead across pages and
+        lets the recognition batches (rec_batch_num) fill up. Images are
+        decoded once up front and handed to PaddleOCR as arrays.
+        
+        Args:
+            image_paths: Paths to the image files
+            batch_size: Number of images passed to PaddleOCR per call
+                       (default: 'batch_size' from the OCR config)
+            images: Already decoded BGR images matching image_paths (optional;
+                   entries may also be paths, which are decoded here)
+            
+        Returns:
+            List with one entry per image, each in the format of process_image
+        """
+        batch_size = max(1, batch_size or self.batch_size)
+        all_results = []
+        for start in range(0, len(image_paths), batch_size):
+            batch_paths = image_paths[start:start + batch_size]
+            # Paths are decoded by _downscale (or passed through if OpenCV
+            # cannot read them)
+            batch, scales = zip(*(
+                self._downscale(img)
+                for img in (images[start:start + batch_size] if images is not None else batch_paths)
+            ))
+            batch = list(batch)
+            logger.info(f"Processing batch of {len(batch)} images")
+            
+            # One result entry per input image
+            try:
+                results = self.ocr.ocr(batch if len(batch) > 1 else batch[0])
+            except Exception as e:
+                logger.debug(f"Batched OCR failed ({e}), processing images one by one")
+                results = None
+            
+            if not results or len(results) != len(batch):
+                # Batched input not supported by this PaddleOCR version
+                results = [(self.ocr.ocr(img) or [None])[0] for img in batch]
+            
+            for path, lines, scale in zip(batch_paths, results, scales):
+                all_results.append(self._structure_results(lines, path, scale))
+        
+        return all_results
+    
+    def _structure_results(self, lines: Optional[List], source: str,
+                           scale: float = 1.0) -> List[Dict]:
+        """
+        Convert PaddleOCR output for one image into box dictionaries.
+        
+        Args:
+            lines: PaddleOCR result lines for the image ([[box], (text, confidence)])
+            source: Image the lines came from (used for logging)
+            scale: Factor the image was resized by before OCR; boxes are
+                   mapped back to original pixel coordinates
+            
+        Returns:
+            List of dictionaries containing bounding box and text information
+        """
+        if not lines:
+            logger.warning(f"No text detected in {source}")
             return []
         
+        if scale != 1.0:
+            lines = [
+                [[[x / scale, y / scale] for x, y in line[0]], line[1]]
+                for line in lines
+            ]
+        
+        # Box geometry for all lines at once: (N, 4, 2) corner coordinates
+        try:
+            boxes_np = np.asarray([line[0] for line in lines], dtype=np.float64)
+        except ValueError:
+            boxes_np = None  # Boxes with differing point counts
+        
+        if boxes_np is not None and boxes_np.ndim == 3:
+            # Center position is used for sorting into reading order
+            centers = boxes_np.mean(axis=1).tolist()
+            mins = boxes_np.min(axis=1).tolist()
+            maxs = boxes_np.max(axis=1).tolist()
+        else:
+            # Same geometry one box at a time, each as a (points, 2) array
+            centers, mins, maxs = [], [], []
+            for line in lines:
+                box_np = np.asarray(line[0], dtype=np.float64)
+                centers.append(box_np.mean(axis=0).tolist())
+                mins.append(box_np.min(axis=0).tolist())
+                maxs.append(box_np.max(axis=0).tolist())
+        
         # Parse and structure the results
         structured_results = []
-        for idx, line in enumerate(result[0]):
-            box = line[0]  # Bounding box coordinates [[x1,y1], [x2,y2], [x3,y3], [x4,y4]]
-            text = line[1][0]  # Recognized text
-            confidence = line[1][1]  # Confidence score
-            
-            # Calculate center position for sorting
-            # This helps in determining reading order
-            center_x = sum([point[0] for point in box]) / 4
-            center_y = sum([point[1] for point in box]) / 4
-            
+        for line, (center_x, center_y), (min_x, min_y), (max_x, max_y) in zip(lines, centers, mins, maxs):
             structured_results.append({
-                'box': box,
-                'text': text,
-                'confidence': confidence,
+                'box': line[0],  # Bounding box coordinates [[x1,y1], [x2,y2], [x3,y3], [x4,y4]]
+                'text': line[1][0],  # Recognized text
+                'confidence': line[1][1],  # Confidence score
                 'position': {
                     'center_x': center_x,
                     'center_y': center_y,
-                    'min_x': min([point[0] for point in box]),
-                    'min_y': min([point[1] for point in box]),
-                    'max_x': max([point[0] for point in box]),
-                    'max_y': max([point[1] for point in box])
+                    'min_x': min_x,
+                    'min_y': min_y,
+                    'max_x': max_x,
+                    'max_y': max_y
                 }
             })
         
@@ -124,15 +482,23 @@ class OCREngine:
         """
         # Sort by y-coordinate first (top to bottom), then x-coordinate (left to right)
         # Group boxes that are on roughly the same line (within threshold)
-        y_threshold = 20  # pixels - adjust based on typical text height
+        # A power of two, so the line group is a bit shift of the y position
+        y_threshold = 16  # pixels - adjust based on typical text height
+        shift = np.uint64(y_threshold.bit_length() - 1)
         
-        # Sort primarily by y-coordinate
-        sorted_boxes = sorted(boxes, key=lambda x: (
-            x['position']['center_y'] // y_threshold,  # Group by approximate line
-            x['position']['center_x']  # Then sort left to right
-        ))
+        centers = np.array(
+            [(box['position']['center_x'], box['position']['center_y']) for box in boxes],
+            dtype=np.float64
+        ).reshape(-1, 2)
         
-        return sorted_boxes
+        # One uint64 key per box: line group in the high 32 bits, whole-pixel
+        # x position in the low 32 bits. The stable sort keeps detection
+        # order for ties
+        coords = np.clip(centers, 0, 0xFFFFFFFF).astype(np.uint64)
+        keys = ((coords[:, 1] >> shift) << np.uint64(32)) | coords[:, 0]
+        order = np.argsort(keys, kind='stable')
+        
+        return [boxes[i] for i in order]
     
     def filter_boxes_by_confidence(self, boxes: List[Dict], min_confidence: float = 0.5) -> List[Dict]:
         """
@@ -145,6 +511,54 @@ class OCREngine:
         Returns:
             Filtered list of boxes
         """
-        filtered = [box for box in boxes if box['confidence'] >= min_confidence]
+        # float64 keeps the comparison identical to comparing Python floats
+        confidences = np.fromiter((box['confidence'] for box in boxes),
+                                  dtype=np.float64, count=len(boxes))
+        filtered = [boxes[i] for i in np.flatnonzero(confidences >= min_confidence)]
         logger.info(f"Filtered {len(boxes) - len(filtered)} low-confidence boxes")
         return filtered
+
+
+def serve(config_path: str = 'config.yaml'):
+    """
+    Keep one engine resident and OCR image paths read from stdin.
+    
+    Each input line is an image path; one JSON object per line is written
+    to stdout with the path and its boxes (or an error message).
+    
+    Args:
+        config_path: Path to configuration YAML file
+    """
+    engine = OCREngine.get(load_config(config_path))
+    
+    for line in sys.stdin:
+        image_path = line.strip()
+        if not image_path:
+            continue
+        try:
+            record = {'path': image_path, 'boxes': engine.process_image(image_path)}
+            output = json.dumps(record, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"Failed to process {image_path}: {e}")
+            output = json.dumps({'path': image_path, 'error': str(e)}, ensure_ascii=False)
+        sys.stdout.write(output + '\n')
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        description='Run the OCR engine as a persistent worker',
+        epilog='Example: ls pages/*.png | python -m ocr_engine --serve > boxes.jsonl'
+    )
+    parser.add_argument('--serve', action='store_true',
+                        help='Read image paths from stdin and print JSON results')
+    parser.add_argument('--config', '-c', default='config.yaml',
+                        help='Path to configuration file (default: config.yaml)')
+    args = parser.parse_args()
+    
+    if not args.serve:
+        parser.print_help()
+        sys.exit(1)
+    serve(args.config)
@@ -6,12 +6,38 @@ Handles saving OCR results in various formats (JSON, text, etc.)
 
 import os
 import json
-from typing import Dict, List
+from typing import Dict, List, Optional, Set
 from datetime import datetime
 import logging
+import numpy as np
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Separator lines of the text results file
+_TITLE_RULE = "=" * 60 + "\n"
+_SECTION_RULE = "-" * 40 + "\n"
+
+
+def _json_default(value):
+    """
+    Serialize result objects that the json module does not handle natively.
+    
+    Args:
+        value: Object to serialize
+        
+    Returns:
+        JSON-compatible representation of the object
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
 
 class OutputManager:
     """
@@ -29,9 +55,29 @@ class OutputManager:
         output_config = config.get('output', {})
         self.output_dir = output_config.get('output_dir', 'output')
         self.save_json = output_config.get('save_json', True)
+        # Indented JSON is easier to read but roughly twice as large
+        self.pretty_json = output_config.get('pretty_json', True)
+        
+        # State of the results currently being streamed (see begin_results)
+        self._json_file = None
+        self._text_file = None
+        self._saved_files = {}
+        self._pages_written = 0
         
         # Create output directory if it doesn't exist
-        os.makedirs(self.output_dir, exist_ok=True)
+        self._dirs_created: Set[str] = set()
+        self._ensure_dir(self.output_dir)
+    
+    def _ensure_dir(self, directory: str):
+        """
+        Create a directory once; later calls for the same path are no-ops.
+        
+        Args:
+            directory: Directory to create if missing
+        """
+        if directory and directory not in self._dirs_created:
+            os.makedirs(directory, exist_ok=True)
+            self._dirs_created.add(directory)
     
     def save_results(self, results: Dict, filename_prefix: str) -> Dict[str, str]:
         """
@@ -44,28 +90,162 @@ class OutputManager:
         Returns:
             Dictionary with paths to saved files
         """
-        saved_files = {}
+        if 'pages' not in results:
+            # Single page results, nothing to stream
+            saved_files = {}
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            if self.save_json:
+                json_path = os.path.join(self.output_dir, f"{filename_prefix}_{timestamp}.json")
+                self._save_json(results, json_path)
+                saved_files['json'] = json_path
+            txt_path = os.path.join(self.output_dir, f"{filename_prefix}_{timestamp}.txt")
+            self._save_text(results, txt_path)
+            saved_files['text'] = txt_path
+            logger.info(f"Results saved to {self.output_dir}")
+            return saved_files
+        
+        header = {key: value for key, value in results.items() if key != 'pages'}
+        self.begin_results(filename_prefix, header)
+        try:
+            for page_data in results['pages']:
+                self.save_page(page_data)
+            return self.end_results()
+        finally:
+            self.close_results()
+    
+    def begin_results(self, filename_prefix: str, header: Dict):
+        """
+        Open output files for a multi-page result that is written page by page.
+        
+        Pages are appended with save_page() as soon as they are processed, so
+        the full result never has to be held in memory. Finish with
+        end_results().
+        
+        Args:
+            filename_prefix: Prefix for output filenames
+            header: Document-level entries written alongside the pages
+                   (e.g. input_file, total_pages, config)
+        """
+        self.close_results()
+        self._ensure_dir(self.output_dir)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._saved_files = {}
+        self._pages_written = 0
         
-        # Save JSON format
+        # JSON format: document entries first, then the pages array
         if self.save_json:
             json_path = os.path.join(
                 self.output_dir,
                 f"{filename_prefix}_{timestamp}.json"
             )
-            self._save_json(results, json_path)
-            saved_files['json'] = json_path
+            self._json_file = open(json_path, 'w', encoding='utf-8')
+            if self.pretty_json:
+                self._json_file.write("{\n")
+                for key, value in header.items():
+                    self._json_file.write(f"  {self._to_json(key, 1)}: {self._to_json(value, 1)},\n")
+                self._json_file.write('  "pages": [')
+            else:
+                self._json_file.write(self._dumps(header)[:-1])
+                self._json_file.write(',"pages":[' if header else '"pages":[')
+            self._saved_files['json'] = json_path
         
-        # Save simple text format
+        # Simple text format
         txt_path = os.path.join(
             self.output_dir,
             f"{filename_prefix}_{timestamp}.txt"
         )
-        self._save_text(results, txt_path)
-        saved_files['text'] = txt_path
+        self._text_file = open(txt_path, 'w', encoding='utf-8')
+        parts = []
+        self._write_text_header(parts)
+        self._text_file.write(''.join(parts))
+        self._saved_files['text'] = txt_path
+    
+    def save_page(self, page_data: Dict):
+        """
+        Append one page's results to the files opened by begin_results().
+        
+        Args:
+            page_data: Dictionary containing page OCR results
+        """
+        self._pages_written += 1
+        if self._json_file is not None:
+            separator = "," if self._pages_written > 1 else ""
+            if self.pretty_json:
+                separator += "\n    "
+            self._json_file.write(separator + self._to_json(page_data, 2))
+        if self._text_file is not None:
+            parts = [f"\n--- Page {self._pages_written} ---\n\n"]
+            self._write_page_results(parts, page_data)
+            self._text_file.write(''.join(parts))
+    
+    def end_results(self) -> Dict[str, str]:
+        """
+        Finish the files opened by begin_results().
+        
+        Returns:
+            Dictionary with paths to saved files
+        """
+        if self._json_file is not None:
+            if self.pretty_json:
+                closing = "\n  ]" if self._pages_written else "]"
+                self._json_file.write(f"{closing}\n}}")
+            else:
+                self._json_file.write("]}")
+            logger.info(f"Saved JSON results to {self._saved_files['json']}")
+        if self._text_file is not None:
+            logger.info(f"Saved text results to {self._saved_files['text']}")
+        self.close_results()
         
         logger.info(f"Results saved to {self.output_dir}")
-        return saved_files
+        return dict(self._saved_files)
+    
+    def close_results(self):
+        """
+        Close any files left open by begin_results() without finishing them.
+        
+        Safe to call multiple times; used for cleanup when processing fails.
+        """
+        for f in (self._json_file, self._text_file):
+            if f is not None:
+                f.close()
+        self._json_file = None
+        self._text_file = None
+    
+    def _dumps(self, value) -> str:
+        """
+        Serialize a value as JSON, using orjson when it is installed.
+        
+        Args:
+            value: Value to serialize
+            
+        Returns:
+            JSON string (indented if 'pretty_json' is enabled)
+        """
+        if orjson is not None:
+            option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            if self.pretty_json:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(value, default=_json_default, option=option).decode('utf-8')
+        if self.pretty_json:
+            return json.dumps(value, indent=2, ensure_ascii=False, default=_json_default)
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'),
+                          default=_json_default)
+    
+    def _to_json(self, value, level: int) -> str:
+        """
+        Serialize a value as JSON nested at the given depth.
+        
+        Args:
+            value: Value to serialize
+            level: Nesting depth (in 2-space indents) of the value in the file
+            
+        Returns:
+            JSON string whose continuation lines are indented for that depth
+        """
+        text = self._dumps(value)
+        if not self.pretty_json:
+            return text
+        return text.replace("\n", "\n" + "  " * level)
     
     def _save_json(self, results: Dict, file_path: str):
         """
@@ -76,7 +256,7 @@ class OutputManager:
             file_path: Path to save the JSON file
         """
         with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+            f.write(self._dumps(results))
         logger.info(f"Saved JSON results to {file_path}")
     
     def _save_text(self, results: Dict, file_path: str):
@@ -87,60 +267,76 @@ class OutputManager:
             results: Results dictionary
             file_path: Path to save the text file
         """
+        parts = []
+        self._write_text_header(parts)
+        
+        if 'pages' in results:
+            # Multi-page results
+            for page_num, page_data in enumerate(results['pages'], start=1):
+                parts.append(f"\n--- Page {page_num} ---\n\n")
+                self._write_page_results(parts, page_data)
+        else:
+            # Single page results
+            self._write_page_results(parts, results)
+        
         with open(file_path, 'w', encoding='utf-8') as f:
-            f.write("=" * 60 + "\n")
-            f.write("OCR RESULTS\n")
-            f.write("=" * 60 + "\n\n")
-            
-            if 'pages' in results:
-                # Multi-page results
-                for page_num, page_data in enumerate(results['pages'], start=1):
-                    f.write(f"\n--- Page {page_num} ---\n\n")
-                    self._write_page_results(f, page_data)
-            else:
-                # Single page results
-                self._write_page_results(f, results)
+            f.write(''.join(parts))
         
         logger.info(f"Saved text results to {file_path}")
     
-    def _write_page_results(self, file, page_data: Dict):
+    def _write_text_header(self, parts: List[str]):
+        """
+        Add the title block of the text results file.
+        
+        Args:
+            parts: List of text chunks to append to
+        """
+        parts.append(_TITLE_RULE + "OCR RESULTS\n" + _TITLE_RULE + "\n")
+    
+    def _write_page_results(self, parts: List[str], page_data: Dict):
         """
-        Write page results to file.
+        Add page results to the text output.
         
         Args:
-            file: File object to write to
+            parts: List of text chunks to append to
             page_data: Dictionary containing page OCR results
         """
         if 'mapped_result' in page_data:
             mapped = page_data['mapped_result']
-            file.write("Mapped Fields:\n")
-            file.write("-" * 40 + "\n")
+            parts.append("Mapped Fields:\n")
+            parts.append(_SECTION_RULE)
             
             for field_name, field_data in mapped['fields'].items():
                 if field_data is not None:
                     text = field_data['text']
                     conf = field_data['confidence']
-                    file.write(f"{field_name}: {text} (confidence: {conf:.2f})\n")
+                    parts.append(f"{field_name}: {text} (confidence: {conf:.2f})\n")
                 else:
-                    file.write(f"{field_name}: [Not detected]\n")
-            
-            file.write("\n")
+                    parts.append(f"{field_name}: [Not detected]\n")
             
             # Show metadata
             metadata = mapped.get('metadata', {})
-            file.write(f"Metadata:\n")
-            file.write(f"  - Mapping mode: {metadata.get('mapping_mode', 'N/A')}\n")
-            file.write(f"  - Total boxes: {metadata.get('total_boxes', 0)}\n")
-            file.write(f"  - Mapped fields: {metadata.get('mapped_fields', 0)}\n")
+            parts.append(
+                f"\nMetadata:\n"
+                f"  - Mapping mode: {metadata.get('mapping_mode', 'N/A')}\n"
+                f"  - Total boxes: {metadata.get('total_boxes', 0)}\n"
+                f"  - Mapped fields: {metadata.get('mapped_fields', 0)}\n"
+            )
             
             unmapped = metadata.get('unmapped_boxes', [])
             if unmapped:
-                file.write(f"\nUnmapped boxes ({len(unmapped)}):\n")
-                for box in unmapped:
-                    file.write(f"  - {box['text']} (confidence: {box.get('confidence', 0):.2f})\n")
-        
-        if 'raw_boxes' in page_data:
-            file.write("\n\nAll Detected Text:\n")
-            file.write("-" * 40 + "\n")
-            for idx, box in enumerate(page_data['raw_boxes'], start=1):
-                file.write(f"{idx}. {box['text']} (conf: {box['confidence']:.2f})\n")
+                parts.append(f"\nUnmapped boxes ({len(unmapped)}):\n")
+                parts.extend(
+                    f"  - {box['text']} (confidence: {box.get('confidence', 0):.2f})\n"
+                    for box in unmapped
+                )
+        
+        # Unfiltered boxes are only present when explicitly kept
+        detected = page_data.get('raw_boxes', page_data.get('filtered_boxes'))
+        if detected is not None:
+            parts.append("\n\nAll Detected Text:\n")
+            parts.append(_SECTION_RULE)
+            parts.extend(
+                f"{idx}. {box['text']} (conf: {box['confidence']:.2f})\n"
+                for idx, box in enumerate(detected, start=1)
+            )
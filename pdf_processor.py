@@ -6,13 +6,22 @@ Supports processing single or multiple pages.
 """
 
 import os
-from typing import List, Optional, Tuple, Dict
+import shutil
+import tempfile
+from typing import List, Optional, Set, Tuple, Dict, Iterator
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from PIL import Image
 import logging
 try:
-    from pdf2image import convert_from_path
+    from pdf2image import convert_from_path, pdfinfo_from_path
 except ImportError:
     convert_from_path = None
+    pdfinfo_from_path = None
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +34,10 @@ class PDFProcessor:
     On macOS: brew install poppler
     On Ubuntu/Debian: apt-get install poppler-utils
     On Windows: Download poppler binaries
+    
+    Alternatively set 'backend: pymupdf' in the pdf config to render with
+    PyMuPDF (pip install pymupdf), which needs no external binaries and
+    avoids the pdftoppm subprocess.
     """
     
     def __init__(self, config: Dict):
@@ -39,8 +52,26 @@ class PDFProcessor:
         self.dpi = self.pdf_config.get('dpi', 300)
         self.first_page = self.pdf_config.get('first_page')
         self.last_page = self.pdf_config.get('last_page')
+        # Pages rasterized per pdf2image call when streaming pages
+        self.chunk_size = self.pdf_config.get('chunk_size', 4)
+        self.backend = self.pdf_config.get('backend', 'pdf2image')
+        # Intermediate image format used by poppler ('jpeg' is much smaller
+        # to pass around than the default uncompressed 'ppm')
+        self.raster_format = self.pdf_config.get('format', 'jpeg')
+        self.jpeg_quality = self.pdf_config.get('jpeg_quality', 90)
+        self.thread_count = self.pdf_config.get('thread_count') or os.cpu_count() or 1
         
-        if convert_from_path is None:
+        # Known (width, height) per image, keyed by real path
+        self._dim_cache: Dict[str, Tuple[int, int]] = {}
+        # Page image directories already known to exist
+        self._dirs_created: Set[str] = set()
+        # Temporary page directories created by convert_pdf_to_images
+        self._temp_dirs: Set[str] = set()
+        
+        if self.backend == 'pymupdf' and fitz is None:
+            logger.warning("PyMuPDF not installed, falling back to pdf2image backend.")
+            self.backend = 'pdf2image'
+        if self.backend != 'pymupdf' and convert_from_path is None:
             logger.warning("pdf2image not installed. PDF processing may not work.")
     
     def is_pdf(self, file_path: str) -> bool:
@@ -64,7 +95,9 @@ class PDFProcessor:
         
         Args:
             pdf_path: Path to the PDF file
-            output_dir: Directory to save converted images (optional)
+            output_dir: Directory to save converted images (optional; by
+                       default a new temporary directory that
+                       cleanup_temp_images removes as a whole)
             
         Returns:
             List of paths to the generated image files
@@ -72,66 +105,238 @@ class PDFProcessor:
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"PDF file not found: {pdf_path}")
         
-        if convert_from_path is None:
-            raise ImportError("pdf2image is not installed. Install with: pip install pdf2image")
-        
         logger.info(f"Converting PDF to images: {pdf_path}")
         
-        # Create output directory if needed
+        # Convert PDF to images
+        # This may take a while for large PDFs
+        if self.backend == 'pymupdf':
+            images = [image for _, image in self.stream_pages(pdf_path)]
+        else:
+            images = self._convert_with_pdf2image(pdf_path, self.first_page, self.last_page)
+        
+        if not images:
+            logger.warning(f"No pages converted from PDF: {pdf_path}")
+            return []
+        
+        temp_dir = None
+        if output_dir is None:
+            base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+            output_dir = temp_dir = tempfile.mkdtemp(prefix=f"{base_name}_pages_")
+            self._temp_dirs.add(temp_dir)
+            self._dirs_created.add(temp_dir)
+        
+        # Save images and collect paths; PIL releases the GIL while encoding,
+        # so pages are written in parallel threads
+        try:
+            with ThreadPoolExecutor(max_workers=min(len(images), os.cpu_count() or 1)) as executor:
+                image_paths = list(executor.map(
+                    lambda args: self.save_page_image(args[1], pdf_path, args[0], output_dir),
+                    enumerate(images, start=1)
+                ))
+        except Exception:
+            # The caller never gets the paths, so it cannot clean them up
+            if temp_dir is not None:
+                self._remove_temp_dir(temp_dir)
+            raise
+        
+        logger.info(f"Converted {len(image_paths)} pages from PDF")
+        return image_paths
+    
+    def save_page_image(self, image: Image.Image, pdf_path: str, page_num: int,
+                        output_dir: Optional[str] = None) -> str:
+        """
+        Save a rasterized PDF page as a PNG file.
+        
+        Args:
+            image: Rasterized page
+            pdf_path: Path to the PDF the page belongs to
+            page_num: 1-based page number (used in the file name)
+            output_dir: Directory to save the image (default: temp_images next to the PDF)
+            
+        Returns:
+            Path to the saved image file
+        """
         if output_dir is None:
             output_dir = os.path.join(os.path.dirname(pdf_path), 'temp_images')
-        os.makedirs(output_dir, exist_ok=True)
+        if output_dir not in self._dirs_created:
+            os.makedirs(output_dir, exist_ok=True)
+            self._dirs_created.add(output_dir)
+        
+        base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        image_path = os.path.join(output_dir, f"{base_name}_page_{page_num}.png")
+        # Pages are temporary, so favor encoding speed over file size
+        image.save(image_path, 'PNG', compress_level=1)
+        self._dim_cache[os.path.realpath(image_path)] = image.size
+        logger.info(f"Saved page {page_num} to {image_path}")
+        return image_path
+    
+    @staticmethod
+    def to_bgr_array(image: Image.Image) -> np.ndarray:
+        """
+        Convert a PIL image to a BGR array, the layout cv2.imread returns.
+        
+        Args:
+            image: PIL image
+            
+        Returns:
+            Contiguous uint8 array of shape (height, width, 3)
+        """
+        return np.ascontiguousarray(np.asarray(image.convert('RGB'))[:, :, ::-1])
+    
+    def get_page_range(self, pdf_path: str) -> Tuple[int, int]:
+        """
+        Get the range of PDF pages to process, honoring first_page/last_page.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            
+        Returns:
+            Tuple of (first_page, last_page), both 1-based and inclusive
+        """
+        if self.backend == 'pymupdf':
+            with fitz.open(pdf_path) as doc:
+                page_count = doc.page_count
+        else:
+            if pdfinfo_from_path is None:
+                raise ImportError("pdf2image is not installed. Install with: pip install pdf2image")
+            page_count = pdfinfo_from_path(pdf_path)['Pages']
+        
+        first_page = self.first_page or 1
+        last_page = min(self.last_page or page_count, page_count)
+        return first_page, last_page
+    
+    def stream_pages(self, pdf_path: str) -> Iterator[Tuple[int, Image.Image]]:
+        """
+        Rasterize a PDF lazily, a few pages at a time.
+        
+        Unlike convert_pdf_to_images, nothing is written to disk and at most
+        'chunk_size' pages are held in memory by this generator.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            
+        Yields:
+            Tuples of (page number starting at 1, page image)
+        """
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+        
+        first_page, last_page = self.get_page_range(pdf_path)
+        
+        if self.backend == 'pymupdf':
+            # MuPDF renders in-process, one page at a time
+            with fitz.open(pdf_path) as doc:
+                for page_num, page_index in enumerate(range(first_page - 1, last_page), start=1):
+                    pixmap = doc[page_index].get_pixmap(dpi=self.dpi)
+                    yield page_num, Image.frombytes(
+                        'RGB', (pixmap.width, pixmap.height), pixmap.samples
+                    )
+            return
+        
+        chunk_size = max(1, self.chunk_size)
+        page_num = 0
+        for chunk_start in range(first_page, last_page + 1, chunk_size):
+            chunk_end = min(chunk_start + chunk_size - 1, last_page)
+            for image in self._convert_with_pdf2image(pdf_path, chunk_start, chunk_end):
+                page_num += 1
+                yield page_num, image
+    
+    def _convert_with_pdf2image(self, pdf_path: str, first_page: Optional[int],
+                                last_page: Optional[int]) -> List[Image.Image]:
+        """
+        Rasterize a page range with pdf2image (poppler).
+        
+        Pages are spread across 'thread_count' pdftoppm processes.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            first_page: First page to convert (None = start of document)
+            last_page: Last page to convert (None = end of document)
+            
+        Returns:
+            List of page images
+        """
+        if convert_from_path is None:
+            raise ImportError("pdf2image is not installed. Install with: pip install pdf2image")
+        
+        kwargs = {}
+        if self.raster_format == 'jpeg':
+            kwargs['jpegopt'] = {'quality': self.jpeg_quality, 'optimize': False}
         
-        # Convert PDF to images
-        # This may take a while for large PDFs
         try:
-            images = convert_from_path(
+            return convert_from_path(
                 pdf_path,
                 dpi=self.dpi,
-                first_page=self.first_page,
-                last_page=self.last_page
+                first_page=first_page,
+                last_page=last_page,
+                fmt=self.raster_format,
+                thread_count=self.thread_count,
+                **kwargs
             )
         except Exception as e:
             logger.error(f"Failed to convert PDF: {e}")
             raise
-        
-        # Save images and collect paths
-        image_paths = []
-        base_name = os.path.splitext(os.path.basename(pdf_path))[0]
-        
-        for i, image in enumerate(images, start=1):
-            image_path = os.path.join(output_dir, f"{base_name}_page_{i}.png")
-            image.save(image_path, 'PNG')
-            image_paths.append(image_path)
-            logger.info(f"Saved page {i} to {image_path}")
-        
-        logger.info(f"Converted {len(image_paths)} pages from PDF")
-        return image_paths
     
     def get_image_dimensions(self, image_path: str) -> Tuple[int, int]:
         """
         Get the dimensions of an image.
         
+        Dimensions of pages rasterized by convert_pdf_to_images are already
+        known; other images are opened on every call, since they may be
+        replaced on disk between calls.
+        
         Args:
             image_path: Path to the image file
             
         Returns:
             Tuple of (width, height)
         """
-        with Image.open(image_path) as img:
-            return img.size
+        size = self._dim_cache.get(os.path.realpath(image_path))
+        if size is None:
+            with Image.open(image_path) as img:
+                size = img.size
+        return size
     
     def cleanup_temp_images(self, image_paths: List[str]):
         """
         Remove temporary image files created during PDF processing.
         
+        If all images are in a temporary directory created by
+        convert_pdf_to_images, the whole directory is removed at once.
+        
         Args:
             image_paths: List of image file paths to remove
         """
+        for image_path in image_paths:
+            self._dim_cache.pop(os.path.realpath(image_path), None)
+        
+        parents = {os.path.dirname(image_path) for image_path in image_paths}
+        if len(parents) == 1:
+            parent = parents.pop()
+            if parent in self._temp_dirs:
+                self._remove_temp_dir(parent)
+                return
+        
         for image_path in image_paths:
             try:
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-                    logger.debug(f"Removed temporary image: {image_path}")
-            except Exception as e:
+                os.remove(image_path)
+                logger.debug(f"Removed temporary image: {image_path}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
                 logger.warning(f"Failed to remove temporary image {image_path}: {e}")
+    
+    def _remove_temp_dir(self, directory: str):
+        """
+        Remove a temporary page directory created by convert_pdf_to_images.
+        
+        Args:
+            directory: Directory to remove, including its page images
+        """
+        prefix = os.path.join(os.path.realpath(directory), '')
+        for key in [key for key in self._dim_cache if key.startswith(prefix)]:
+            del self._dim_cache[key]
+        shutil.rmtree(directory, ignore_errors=True)
+        self._temp_dirs.discard(directory)
+        self._dirs_created.discard(directory)
+        logger.debug(f"Removed temporary directory: {directory}")
@@ -0,0 +1,122 @@
+"""
+Tests for BoxMapper field assignment and region matching.
+"""
+
+import json
+import unittest
+
+import numpy as np
+
+import box_mapper
+from box_mapper import BoxMapper, MappedFields
+
+
+def _box(text, confidence, x=0, y=0):
+    return {
+        'box': [[x, y], [x + 10, y], [x + 10, y + 5], [x, y + 5]],
+        'text': text,
+        'confidence': confidence,
+        'position': {'center_x': x + 5, 'center_y': y + 2.5}
+    }
+
+
+class TestMappedFields(unittest.TestCase):
+    
+    def _sequential(self, fields, boxes):
+        mapper = BoxMapper({'box_mapping': {'mode': 'sequential', 'sequential_fields': fields}})
+        return mapper.map_boxes_to_fields(boxes)
+    
+    def test_as_dict_matches_fields(self):
+        result = self._sequential(['firstName', 'lastName', 'email'],
+                                  [_box('Jane', 0.98), _box('Doe', 0.91, y=10)])
+        fields = result['fields']
+        self.assertIsInstance(fields, MappedFields)
+        plain = fields.as_dict()
+        self.assertIs(type(plain), dict)
+        self.assertEqual(plain, fields)
+        self.assertEqual(plain['firstName']['text'], 'Jane')
+        self.assertIsNone(plain['email'])
+        self.assertEqual(fields.texts, ['Jane', 'Doe', None])
+        np.testing.assert_array_equal(fields.confidences, [0.98, 0.91, np.nan])
+    
+    def test_json_export_with_plain_json(self):
+        result = self._sequential(['firstName', 'email'], [_box('Jane', 0.98)])
+        data = json.loads(json.dumps(result))
+        self.assertEqual(data['fields']['firstName'],
+                         {'text': 'Jane', 'confidence': 0.98,
+                          'box': [[0, 0], [10, 0], [10, 5], [0, 5]]})
+        self.assertIsNone(data['fields']['email'])
+    
+    def test_fields_are_writable(self):
+        result = self._sequential(['firstName', 'email'], [_box('Jane', 0.98)])
+        fields = result['fields']
+        fields['firstName']['text'] = 'Janet'
+        fields['email'] = {'text': 'jane@example.com', 'confidence': 1.0, 'box': None}
+        self.assertEqual(fields.texts, ['Janet', 'jane@example.com'])
+        self.assertEqual(
+            BoxMapper({}).create_simple_output(result),
+            {'firstName': 'Janet', 'email': 'jane@example.com'}
+        )
+    
+    def test_duplicate_field_names(self):
+        result = self._sequential(['name', 'name', 'email'],
+                                  [_box('Jane', 0.98), _box('Doe', 0.91, y=10)])
+        fields = result['fields']
+        self.assertEqual(len(fields), 2)
+        self.assertEqual(len(fields), len(list(fields.items())))
+        self.assertEqual(fields.field_names, ['name', 'email'])
+        self.assertEqual(fields['name']['text'], 'Doe')
+    
+    def test_positional_uses_same_type(self):
+        mapper = BoxMapper({'box_mapping': {
+            'mode': 'positional',
+            'positional_mapping': {
+                'title': {'region': [0.0, 0.0, 1.0, 0.5]},
+                'footer': {'region': [0.0, 0.5, 1.0, 1.0]}
+            }
+        }})
+        result = mapper.map_boxes_to_fields([_box('Title', 0.9), _box('Title?', 0.5)], 100, 100)
+        fields = result['fields']
+        self.assertIsInstance(fields, MappedFields)
+        self.assertEqual(fields.texts, ['Title', None])
+        self.assertEqual(result['metadata']['mapped_fields'], 1)
+        self.assertEqual(json.loads(json.dumps(fields))['footer'], None)
+
+
+
+@unittest.skipIf(box_mapper.njit is None, "numba not installed")
+class TestAssignRegionsNumba(unittest.TestCase):
+    
+    def _assert_same(self, centers, regions, confidences):
+        valid = regions[~np.isnan(regions).any(axis=1)]
+        if len(valid):
+            mbr = np.array([valid[:, 0].min(), valid[:, 1].min(),
+                            valid[:, 2].max(), valid[:, 3].max()])
+        else:
+            mbr = np.full(4, np.nan)
+        expected = box_mapper._assign_regions_numpy(centers, regions, mbr, confidences)
+        actual = box_mapper._assign_regions(centers, regions, mbr, confidences)
+        np.testing.assert_array_equal(actual[0], expected[0])
+        np.testing.assert_array_equal(actual[1], expected[1])
+    
+    def test_matches_numpy_on_random_layouts(self):
+        rng = np.random.default_rng(7)
+        for _ in range(20):
+            corners = rng.random((12, 2, 2))
+            regions = np.concatenate([corners.min(axis=1), corners.max(axis=1)], axis=1)
+            regions[rng.random(12) < 0.2] = np.nan  # Malformed regions
+            centers = rng.random((200, 2))
+            # Rounded so that equal confidences (ties) occur
+            confidences = rng.random(200).round(1)
+            self._assert_same(centers, regions, confidences)
+    
+    def test_matches_numpy_on_edges_and_empty_input(self):
+        regions = np.array([[0.0, 0.0, 0.5, 0.5], [0.5, 0.5, 1.0, 1.0]])
+        centers = np.array([[0.5, 0.5], [0.0, 0.0], [1.0, 1.0], [1.5, 0.2]])
+        self._assert_same(centers, regions, np.array([0.9, 0.9, 0.8, 0.7]))
+        self._assert_same(np.empty((0, 2)), regions, np.empty(0))
+        self._assert_same(centers, np.full((1, 4), np.nan), np.ones(4))
+
+
+if __name__ == '__main__':
+    unittest.main()
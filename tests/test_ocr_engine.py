@@ -0,0 +1,219 @@
+"""
+Tests for OCREngine image decoding, downscaling, reading-order sorting,
+model quantization and the --serve worker.
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+import ocr_engine
+from ocr_engine import OCREngine
+
+
+class _FakeTurboJPEG:
+    """Decoder that marks its output so tests can tell which path ran"""
+    
+    def decode(self, data, pixel_format=None):
+        return 'turbo'
+
+
+class TestDecodeImage(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.image = Image.fromarray(np.random.randint(0, 255, (40, 80, 3), dtype=np.uint8))
+        self._saved = (ocr_engine.TurboJPEG, ocr_engine._turbo_jpeg)
+        ocr_engine.TurboJPEG = _FakeTurboJPEG
+        ocr_engine.TJPF_BGR = 0
+        ocr_engine._turbo_jpeg = None
+    
+    def tearDown(self):
+        ocr_engine.TurboJPEG, ocr_engine._turbo_jpeg = self._saved
+    
+    def _save_jpeg(self, name: str, orientation: int = None) -> str:
+        path = os.path.join(self.tmp, name)
+        exif = Image.Exif()
+        if orientation is not None:
+            exif[0x0112] = orientation
+        self.image.save(path, exif=exif)
+        return path
+    
+    def test_upright_jpeg_uses_turbojpeg(self):
+        self.assertEqual(OCREngine.decode_image(self._save_jpeg('upright.jpg')), 'turbo')
+    
+    def test_rotated_jpeg_applies_exif_orientation(self):
+        # Orientation 6: stored landscape, displayed rotated 90 degrees
+        decoded = OCREngine.decode_image(self._save_jpeg('rotated.jpg', orientation=6))
+        self.assertEqual(decoded.shape, (80, 40, 3))
+    
+    def test_missing_file(self):
+        self.assertIsNone(OCREngine.decode_image(os.path.join(self.tmp, 'missing.jpg')))
+
+
+
+class TestQuantizeModelDir(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.model_dir = os.path.join(self.tmp, 'rec')
+        os.makedirs(self.model_dir)
+        for name in ('inference.pdmodel', 'inference.pdiparams', 'inference.yml'):
+            with open(os.path.join(self.model_dir, name), 'w') as f:
+                f.write(name)
+        self.before_replace = None
+    
+    def _fake_paddle2onnx(self, args, **kwargs):
+        with open(args[args.index('--save_file') + 1], 'w') as f:
+            f.write('fp32')
+    
+    def _fake_quantize_dynamic(self, model_input, model_output, weight_type=None):
+        with open(model_output, 'w') as f:
+            f.write('int8')
+        if self.before_replace is not None:
+            self.before_replace()
+    
+    def _quantize(self):
+        quantization = types.SimpleNamespace(
+            QuantType=types.SimpleNamespace(QInt8='QInt8'),
+            quantize_dynamic=self._fake_quantize_dynamic
+        )
+        modules = {
+            'onnxruntime': types.SimpleNamespace(quantization=quantization),
+            'onnxruntime.quantization': quantization
+        }
+        with mock.patch.dict(sys.modules, modules), \
+                mock.patch.object(ocr_engine.subprocess, 'run', side_effect=self._fake_paddle2onnx):
+            return ocr_engine._quantize_model_dir(self.model_dir)
+    
+    def test_builds_quantized_copy(self):
+        quantized_dir = self._quantize()
+        self.assertEqual(quantized_dir, self.model_dir + '_int8')
+        self.assertEqual(
+            sorted(os.listdir(quantized_dir)),
+            ['inference.onnx', 'inference.pdiparams', 'inference.pdmodel', 'inference.yml']
+        )
+        self.assertEqual(sorted(os.listdir(self.tmp)), ['rec', 'rec_int8'])
+    
+    def test_concurrent_conversion_keeps_finished_copy(self):
+        def other_process_finishes():
+            other = self.model_dir + '_int8'
+            os.makedirs(other)
+            with open(os.path.join(other, 'inference.onnx'), 'w') as f:
+                f.write('other')
+        
+        self.before_replace = other_process_finishes
+        quantized_dir = self._quantize()
+        with open(os.path.join(quantized_dir, 'inference.onnx')) as f:
+            self.assertEqual(f.read(), 'other')
+        self.assertEqual(sorted(os.listdir(self.tmp)), ['rec', 'rec_int8'])
+
+
+class _RecordingOCR:
+    """PaddleOCR stand-in returning one fixed box in the coordinates it was given"""
+    
+    def __init__(self):
+        self.shapes = []
+    
+    def ocr(self, image):
+        self.shapes.append(image.shape)
+        return [[[[[10, 10], [50, 10], [50, 20], [10, 20]], ('Total', 0.95)]]]
+
+
+class TestDownscaledCoordinates(unittest.TestCase):
+    
+    def setUp(self):
+        self.engine = OCREngine.__new__(OCREngine)
+        self.engine.max_side = 100
+        self.engine.batch_size = 1
+        self.engine.ocr = _RecordingOCR()
+    
+    def test_structure_results_maps_back_to_original_space(self):
+        lines = [[[[10, 10], [50, 10], [50, 20], [10, 20]], ('Total', 0.95)]]
+        box = self.engine._structure_results(lines, 'page', scale=0.25)[0]
+        self.assertEqual(box['box'], [[40, 40], [200, 40], [200, 80], [40, 80]])
+        self.assertEqual(
+            box['position'],
+            {'center_x': 120, 'center_y': 60, 'min_x': 40, 'min_y': 40, 'max_x': 200, 'max_y': 80}
+        )
+    
+    def test_process_image_downscales_but_reports_original_positions(self):
+        image = np.zeros((200, 400, 3), dtype=np.uint8)
+        box = self.engine.process_image(image)[0]
+        self.assertEqual(self.engine.ocr.shapes, [(50, 100, 3)])
+        self.assertEqual(box['box'], [[40, 40], [200, 40], [200, 80], [40, 80]])
+        self.assertEqual((box['position']['center_x'], box['position']['center_y']), (120, 60))
+    
+    def test_small_image_is_not_rescaled(self):
+        image = np.zeros((50, 80, 3), dtype=np.uint8)
+        box = self.engine.process_image(image)[0]
+        self.assertEqual(self.engine.ocr.shapes, [(50, 80, 3)])
+        self.assertEqual(box['box'], [[10, 10], [50, 10], [50, 20], [10, 20]])
+
+
+def _positioned(text, x, y):
+    return {'text': text, 'position': {'center_x': x, 'center_y': y}}
+
+
+class TestSortBoxesReadingOrder(unittest.TestCase):
+    
+    def setUp(self):
+        self.engine = OCREngine.__new__(OCREngine)
+    
+    def _texts(self, boxes):
+        return [box['text'] for box in self.engine.sort_boxes_reading_order(boxes)]
+    
+    def test_lines_are_16_pixel_bands(self):
+        boxes = [
+            _positioned('line2-right', 300, 40),
+            _positioned('line1-right', 200, 14.5),
+            _positioned('line1-left', 20, 3),
+            _positioned('line2-left', 10, 33),
+            # 16 px band boundary: y=16 starts the next line
+            _positioned('line1b', 5, 16),
+        ]
+        self.assertEqual(
+            self._texts(boxes),
+            ['line1-left', 'line1-right', 'line1b', 'line2-left', 'line2-right']
+        )
+    
+    def test_x_ties_within_a_pixel_keep_detection_order(self):
+        boxes = [_positioned('second', 10.7, 5), _positioned('first', 10.2, 5)]
+        self.assertEqual(self._texts(boxes), ['second', 'first'])
+    
+    def test_empty(self):
+        self.assertEqual(self.engine.sort_boxes_reading_order([]), [])
+
+
+class TestServe(unittest.TestCase):
+    
+    def test_unserializable_result_does_not_stop_server(self):
+        class Engine:
+            def process_image(self, path):
+                if path == 'bad.png':
+                    return [object()]
+                return [{'text': 'ok'}]
+        
+        stdin = io.StringIO("bad.png\ngood.png\n")
+        stdout = io.StringIO()
+        with mock.patch.object(OCREngine, 'get', return_value=Engine()), \
+                mock.patch.object(sys, 'stdin', stdin), \
+                mock.patch.object(sys, 'stdout', stdout):
+            ocr_engine.serve('missing_config.yaml')
+        
+        records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(records[0]['path'], 'bad.png')
+        self.assertIn('error', records[0])
+        self.assertEqual(records[1], {'path': 'good.png', 'boxes': [{'text': 'ok'}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Tests for OutputManager JSON serialization.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import output_manager
+from box_mapper import BoxMapper
+from output_manager import OutputManager
+
+
+def _sequential_results():
+    mapper = BoxMapper({'box_mapping': {
+        'mode': 'sequential',
+        'sequential_fields': ['firstName', 'lastName', 'email']
+    }})
+    boxes = [
+        {'box': [[0, 0], [10, 0], [10, 5], [0, 5]], 'text': 'Jane', 'confidence': 0.98},
+        {'box': [[0, 10], [10, 10], [10, 15], [0, 15]], 'text': 'Doe', 'confidence': 0.91},
+    ]
+    return {
+        'input_file': 'form.png',
+        'total_pages': 1,
+        'pages': [{'page_number': 1, 'mapped_result': mapper.map_boxes_to_fields(boxes)}]
+    }
+
+
+class TestJsonSerialization(unittest.TestCase):
+    
+    def _save(self, use_orjson: bool, pretty: bool) -> str:
+        saved = output_manager.orjson
+        if not use_orjson:
+            output_manager.orjson = None
+        try:
+            output_dir = tempfile.mkdtemp()
+            manager = OutputManager({'output': {'output_dir': output_dir, 'pretty_json': pretty}})
+            files = manager.save_results(_sequential_results(), 'form')
+            with open(files['json'], encoding='utf-8') as f:
+                return f.read()
+        finally:
+            output_manager.orjson = saved
+    
+    def test_sequential_fields_written_per_field(self):
+        data = json.loads(self._save(use_orjson=False, pretty=True))
+        fields = data['pages'][0]['mapped_result']['fields']
+        self.assertEqual(fields['firstName']['text'], 'Jane')
+        self.assertEqual(fields['lastName']['confidence'], 0.91)
+        self.assertIsNone(fields['email'])
+        self.assertEqual(
+            set(data['pages'][0]['mapped_result']),
+            {'fields', 'metadata'}
+        )
+    
+    @unittest.skipIf(output_manager.orjson is None, "orjson not installed")
+    def test_orjson_matches_stdlib(self):
+        for pretty in (True, False):
+            with self.subTest(pretty=pretty):
+                self.assertEqual(
+                    self._save(use_orjson=True, pretty=pretty),
+                    self._save(use_orjson=False, pretty=pretty)
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Tests for PDFProcessor page images, their temporary directories and dimensions.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+import pdf_processor
+from pdf_processor import PDFProcessor
+
+
+class TestConvertPdfToImages(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.pdf_path = os.path.join(self.tmp, 'doc.pdf')
+        with open(self.pdf_path, 'wb') as f:
+            f.write(b'%PDF-1.4\n')
+        self.processor = PDFProcessor({})
+        real_mkdtemp = tempfile.mkdtemp
+        patcher = mock.patch.object(
+            pdf_processor.tempfile, 'mkdtemp',
+            side_effect=lambda prefix: real_mkdtemp(prefix=prefix, dir=self.tmp)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _convert(self, pages):
+        with mock.patch.object(self.processor, '_convert_with_pdf2image', return_value=pages):
+            return self.processor.convert_pdf_to_images(self.pdf_path)
+    
+    def _leftover_dirs(self):
+        return [name for name in os.listdir(self.tmp) if name != 'doc.pdf']
+    
+    def test_pages_are_written_and_cleaned_up(self):
+        paths = self._convert([Image.new('RGB', (30, 20)) for _ in range(2)])
+        self.assertEqual(len(paths), 2)
+        self.assertTrue(all(os.path.isfile(path) for path in paths))
+        self.assertEqual(self.processor.get_image_dimensions(paths[0]), (30, 20))
+        
+        self.processor.cleanup_temp_images(paths)
+        self.assertEqual(self._leftover_dirs(), [])
+    
+    def test_no_pages_leaves_no_directory(self):
+        self.assertEqual(self._convert([]), [])
+        self.assertEqual(self._leftover_dirs(), [])
+    
+    def test_failed_save_removes_directory(self):
+        real_save = self.processor.save_page_image
+        
+        def failing_save(image, pdf_path, page_num, output_dir):
+            if page_num == 2:
+                raise OSError("disk full")
+            return real_save(image, pdf_path, page_num, output_dir)
+        
+        with mock.patch.object(self.processor, 'save_page_image', side_effect=failing_save):
+            with self.assertRaises(OSError):
+                self._convert([Image.new('RGB', (30, 20)) for _ in range(3)])
+        self.assertEqual(self._leftover_dirs(), [])
+        self.assertEqual(self.processor._temp_dirs, set())
+        self.assertEqual(self.processor._dim_cache, {})
+
+
+
+class TestGetImageDimensions(unittest.TestCase):
+    
+    def test_replaced_image_is_not_stale(self):
+        image_path = os.path.join(tempfile.mkdtemp(), 'scan.png')
+        processor = PDFProcessor({})
+        Image.new('RGB', (30, 20)).save(image_path)
+        self.assertEqual(processor.get_image_dimensions(image_path), (30, 20))
+        
+        Image.new('RGB', (50, 40)).save(image_path)
+        self.assertEqual(processor.get_image_dimensions(image_path), (50, 40))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Tests for the pipelined PDF processing in OCRApplication.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from PIL import Image
+
+from main import OCRApplication
+
+
+class TestPipelinedPdf(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.pdf_path = os.path.join(self.tmp, 'doc.pdf')
+        with open(self.pdf_path, 'wb') as f:
+            f.write(b'%PDF-1.4')
+        self.page_count = 60  # Far more pages than the bounded queues hold
+        
+        self.app = OCRApplication(config={
+            'ocr': {'warmup': False, 'enable_hpi': False, 'batch_size': 2},
+            'runtime': {'workers': 1, 'pipeline': True, 'max_wait_ms': 1},
+            'output': {'output_dir': os.path.join(self.tmp, 'out')},
+            'box_mapping': {'mode': 'sequential', 'sequential_fields': ['a']}
+        })
+        self.app.pdf_processor.get_page_range = lambda path: (1, self.page_count)
+        self.app.pdf_processor.stream_pages = self._stream_pages
+    
+    def _stream_pages(self, pdf_path):
+        for page_num in range(1, self.page_count + 1):
+            yield page_num, Image.new('RGB', (32, 32), 'white')
+    
+    def _run(self, timeout: float = 30.0):
+        outcome = {}
+        
+        def target():
+            try:
+                outcome['result'] = self.app.process_file(self.pdf_path, save_visualization=False)
+            except Exception as e:
+                outcome['error'] = e
+        
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        self.assertFalse(thread.is_alive(), "pipelined processing did not finish")
+        return outcome
+    
+    def test_ocr_failure_does_not_hang(self):
+        calls = []
+        
+        def failing_process_images(paths, images=None):
+            calls.append(len(paths))
+            if len(calls) == 3:
+                # Give the rasterizer time to fill the bounded queue first
+                time.sleep(0.5)
+                raise RuntimeError("OCR failed")
+            return [[] for _ in paths]
+        
+        self.app.ocr_engine.process_images = failing_process_images
+        outcome = self._run()
+        self.assertIsInstance(outcome.get('error'), RuntimeError)
+    
+    def test_all_pages_processed(self):
+        box = [[0, 0], [10, 0], [10, 5], [0, 5]]
+        self.app.ocr_engine.process_images = lambda paths, images=None: [
+            [{'box': box, 'text': 'x', 'confidence': 0.9,
+              'position': {'center_x': 5.0, 'center_y': 2.5}}]
+            for _ in paths
+        ]
+        outcome = self._run()
+        self.assertNotIn('error', outcome)
+        self.assertEqual(
+            [page['page_number'] for page in outcome['result']['pages']],
+            list(range(1, self.page_count + 1))
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Tests for Visualizer background writes.
+"""
+
+import os
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from visualizer import Visualizer
+
+
+BOXES = [{'box': [[5, 5], [40, 5], [40, 20], [5, 20]], 'text': 'abc', 'confidence': 0.9}]
+
+
+class TestVisualizerWrites(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.visualizer = Visualizer({'output': {}})
+        self.image = np.full((60, 80, 3), 255, dtype=np.uint8)
+    
+    def test_flush_waits_for_written_file(self):
+        output_path = os.path.join(self.tmp, 'out', 'boxes.png')
+        self.visualizer.draw_boxes(self.image, BOXES, output_path)
+        self.visualizer.flush()
+        self.assertTrue(os.path.isfile(output_path))
+    
+    def test_flush_raises_write_failure(self):
+        # A directory where the PNG should go makes cv2.imwrite fail
+        output_path = os.path.join(self.tmp, 'boxes.png')
+        os.makedirs(output_path)
+        self.visualizer.draw_boxes(self.image, BOXES, output_path)
+        with self.assertRaises(Exception):
+            self.visualizer.flush()
+    
+    def test_flush_without_raising(self):
+        output_path = os.path.join(self.tmp, 'boxes.png')
+        os.makedirs(output_path)
+        self.visualizer.draw_boxes(self.image, BOXES, output_path)
+        self.visualizer.flush(raise_errors=False)
+        self.visualizer.flush()  # Nothing left pending
+    
+    def test_drawing_waits_when_writes_back_up(self):
+        release = threading.Event()
+        
+        def slow_write(output_path, image, params):
+            release.wait(5)
+        
+        visualizer = Visualizer({'output': {'max_pending_writes': 2}})
+        visualizer._write_png = slow_write
+        for name in ('a.png', 'b.png'):
+            visualizer.draw_boxes(self.image, BOXES, os.path.join(self.tmp, name))
+        
+        third = threading.Thread(
+            target=visualizer.draw_boxes,
+            args=(self.image, BOXES, os.path.join(self.tmp, 'c.png'))
+        )
+        third.start()
+        third.join(0.2)
+        self.assertTrue(third.is_alive())
+        
+        release.set()
+        third.join(5)
+        self.assertFalse(third.is_alive())
+        visualizer.close()
+    
+    def test_close_writes_and_stops_writer(self):
+        output_path = os.path.join(self.tmp, 'boxes.png')
+        self.visualizer.draw_boxes(self.image, BOXES, output_path)
+        self.visualizer.close()
+        self.assertTrue(os.path.isfile(output_path))
+        with self.assertRaises(RuntimeError):
+            self.visualizer.draw_boxes(self.image, BOXES, output_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
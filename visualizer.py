@@ -5,7 +5,8 @@ Provides utilities to visualize OCR results with bounding boxes.
 """
 
 import os
-from typing import List, Dict, Tuple, Any
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import List, Dict, Set, Tuple, Any, Union
 import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
@@ -30,52 +31,68 @@ class Visualizer:
         output_config = config.get('output', {})
         self.color = tuple(output_config.get('visualization_color', [0, 255, 0]))
         self.thickness = 2
+        # Low zlib level: the default spends most of the time compressing
+        self.png_params = [cv2.IMWRITE_PNG_COMPRESSION,
+                           output_config.get('png_compression', 1)]
+        
+        # PNG encoding runs on background threads (OpenCV releases the GIL)
+        self._writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='viz-writer')
+        self._pending: List[Future] = []
+        # Writes allowed in flight before drawing waits (each holds a full image)
+        self.max_pending = max(1, output_config.get('max_pending_writes', 4))
+        
+        # Output directories already known to exist
+        self._dirs_created: Set[str] = set()
     
-    def draw_boxes(self, image_path: str, boxes: List[Dict], 
-                   output_path: str, show_text: bool = True) -> str:
+    def draw_boxes(self, image_path: Union[str, np.ndarray], boxes: List[Dict], 
+                   output_path: str, show_text: bool = True, inplace: bool = False) -> str:
         """
         Draw bounding boxes on an image and save the result.
         
+        The PNG is written in the background: the file is only guaranteed
+        to exist, and write errors are only reported, once flush() returns.
+        
         Args:
-            image_path: Path to the original image
+            image_path: Path to the original image, or the decoded BGR image
             boxes: List of box dictionaries with 'box' and 'text' keys
             output_path: Path to save the annotated image
             show_text: Whether to display the recognized text above boxes
+            inplace: Draw directly on a passed-in image array instead of a copy
+                    (the array must not be modified afterwards)
             
         Returns:
-            Path to the saved visualization
+            Path the visualization is being written to
         """
-        # Read image using OpenCV
-        image = cv2.imread(image_path)
-        if image is None:
-            raise ValueError(f"Failed to load image: {image_path}")
-        
-        # Draw each bounding box
-        for idx, box_info in enumerate(boxes):
-            box = box_info['box']
-            text = box_info['text']
-            confidence = box_info.get('confidence', 0)
-            
-            # Convert box coordinates to integers
-            # Box format: [[x1,y1], [x2,y2], [x3,y3], [x4,y4]]
-            points = np.array(box, dtype=np.int32)
-            
-            # Draw the bounding box polygon
-            cv2.polylines(image, [points], isClosed=True, 
-                         color=self.color, thickness=self.thickness)
-            
-            # Optionally add text label
-            if show_text and text:
+        image = self._load_image(image_path, inplace)
+        
+        if not boxes:
+            self._save_image(image, output_path)
+            return output_path
+        
+        # Convert box coordinates to integers
+        # Box format: [[x1,y1], [x2,y2], [x3,y3], [x4,y4]]
+        points = self._box_points(boxes)
+        
+        # Draw all bounding box polygons in one call
+        cv2.polylines(image, points, isClosed=True,
+                      color=self.color, thickness=self.thickness)
+        
+        # Optionally add text labels
+        if show_text:
+            labels = [
+                (points[idx], f"{box_info['text']} ({box_info.get('confidence', 0):.2f})")
+                for idx, box_info in enumerate(boxes) if box_info['text']
+            ]
+            label_sizes = [
+                cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0]
+                for _, label in labels
+            ]
+            for (box_points, label), (text_width, text_height) in zip(labels, label_sizes):
                 # Position text above the top-left corner of the box
-                text_x = int(points[0][0])
-                text_y = int(points[0][1]) - 10
+                text_x = int(box_points[0][0])
+                text_y = int(box_points[0][1]) - 10
                 
                 # Add background rectangle for better readability
-                label = f"{text} ({confidence:.2f})"
-                (text_width, text_height), _ = cv2.getTextSize(
-                    label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1
-                )
-                
                 cv2.rectangle(
                     image,
                     (text_x, text_y - text_height - 5),
@@ -97,31 +114,31 @@ class Visualizer:
                 )
         
         # Save the annotated image
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        cv2.imwrite(output_path, image)
+        self._save_image(image, output_path)
         logger.info(f"Saved visualization to {output_path}")
         
         return output_path
     
-    def create_field_visualization(self, image_path: str, mapped_result: Dict,
-                                   output_path: str) -> str:
+    def create_field_visualization(self, image_path: Union[str, np.ndarray], mapped_result: Dict,
+                                   output_path: str, inplace: bool = False) -> str:
         """
         Create visualization with field labels instead of recognized text.
         
         This shows which box corresponds to which field (e.g., firstName, lastName).
         Useful for debugging and understanding the mapping.
+        Like draw_boxes, the file is written in the background (see flush()).
         
         Args:
-            image_path: Path to the original image
+            image_path: Path to the original image, or the decoded BGR image
             mapped_result: Result from BoxMapper with field assignments
             output_path: Path to save the visualization
+            inplace: Draw directly on a passed-in image array instead of a copy
+                    (the array must not be modified afterwards)
             
         Returns:
-            Path to the saved visualization
+            Path the visualization is being written to
         """
-        image = cv2.imread(image_path)
-        if image is None:
-            raise ValueError(f"Failed to load image: {image_path}")
+        image = self._load_image(image_path, inplace)
         
         # Define colors for different fields (cycling through a palette)
         colors = [
@@ -134,18 +151,28 @@ class Visualizer:
         ]
         
         # Draw boxes for each mapped field
-        for idx, (field_name, field_data) in enumerate(mapped_result['fields'].items()):
-            if field_data is not None:
-                box = field_data['box']
-                color = colors[idx % len(colors)]
-                
-                points = np.array(box, dtype=np.int32)
-                cv2.polylines(image, [points], isClosed=True, 
-                             color=color, thickness=self.thickness)
-                
-                # Add field name label
-                text_x = int(points[0][0])
-                text_y = int(points[0][1]) - 10
+        mapped = [
+            (idx, field_name, field_data['box'])
+            for idx, (field_name, field_data) in enumerate(mapped_result['fields'].items())
+            if field_data is not None
+        ]
+        if mapped:
+            points = self._box_points([{'box': box} for _, _, box in mapped])
+            
+            # One polylines call per palette color
+            for color_idx, color in enumerate(colors):
+                color_points = [
+                    points[i] for i, (idx, _, _) in enumerate(mapped)
+                    if idx % len(colors) == color_idx
+                ]
+                if color_points:
+                    cv2.polylines(image, color_points, isClosed=True,
+                                  color=color, thickness=self.thickness)
+            
+            # Add field name labels
+            for box_points, (idx, field_name, _) in zip(points, mapped):
+                text_x = int(box_points[0][0])
+                text_y = int(box_points[0][1]) - 10
                 
                 cv2.putText(
                     image,
@@ -153,13 +180,144 @@ class Visualizer:
                     (text_x, text_y),
                     cv2.FONT_HERSHEY_SIMPLEX,
                     0.7,
-                    color,
+                    colors[idx % len(colors)],
                     2,
                     cv2.LINE_AA
                 )
         
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        cv2.imwrite(output_path, image)
+        self._save_image(image, output_path)
         logger.info(f"Saved field visualization to {output_path}")
         
         return output_path
+    
+    @staticmethod
+    def _load_image(image: Union[str, np.ndarray], inplace: bool) -> np.ndarray:
+        """
+        Get the image to draw on.
+        
+        Args:
+            image: Path to the image, or an already decoded BGR image
+            inplace: Whether a passed-in array may be drawn on directly
+            
+        Returns:
+            BGR image array
+        """
+        if isinstance(image, np.ndarray):
+            return image if inplace else image.copy()
+        
+        # Read image using OpenCV
+        decoded = cv2.imread(image)
+        if decoded is None:
+            raise ValueError(f"Failed to load image: {image}")
+        return decoded
+    
+    @staticmethod
+    def _box_points(boxes: List[Dict]) -> List[np.ndarray]:
+        """
+        Convert box coordinates to int32 point arrays for OpenCV.
+        
+        Args:
+            boxes: List of box dictionaries with a 'box' key
+            
+        Returns:
+            List with one (points, 2) int32 array per box
+        """
+        try:
+            # Usual case: all boxes are quadrilaterals, convert in one go
+            return list(np.asarray([b['box'] for b in boxes], dtype=np.int32))
+        except ValueError:
+            return [np.asarray(b['box'], dtype=np.int32) for b in boxes]
+    
+    def _ensure_dir(self, directory: str):
+        """
+        Create a directory once; later calls for the same path are no-ops.
+        
+        Args:
+            directory: Directory to create if missing
+        """
+        if directory and directory not in self._dirs_created:
+            os.makedirs(directory, exist_ok=True)
+            self._dirs_created.add(directory)
+    
+    def _save_image(self, image: np.ndarray, output_path: str):
+        """
+        Queue an annotated image to be written as PNG in the background.
+        
+        Call flush() before relying on the file being on disk.
+        
+        Args:
+            image: Annotated image (no longer modified by the caller)
+            output_path: Path to save the image to
+        """
+        self._ensure_dir(os.path.dirname(output_path))
+        self._wait_for_writer()
+        self._pending.append(
+            self._writer.submit(self._write_png, output_path, image, self.png_params)
+        )
+    
+    def _wait_for_writer(self):
+        """
+        Block until fewer than max_pending writes are in flight.
+        
+        Successful writes are dropped from the pending list; failed ones
+        are kept so that flush() still reports them.
+        """
+        self._pending = [
+            future for future in self._pending
+            if not future.done() or future.exception() is not None
+        ]
+        in_flight = [future for future in self._pending if not future.done()]
+        if len(in_flight) >= self.max_pending:
+            wait(in_flight, return_when=FIRST_COMPLETED)
+    
+    @staticmethod
+    def _write_png(output_path: str, image: np.ndarray, params: List[int]):
+        """
+        Write an image, raising if OpenCV reports a failure.
+        
+        Args:
+            output_path: Path to save the image to
+            image: Image to write
+            params: cv2.imwrite encoding parameters
+        """
+        if not cv2.imwrite(output_path, image, params):
+            raise IOError(f"Failed to write visualization: {output_path}")
+    
+    def flush(self, raise_errors: bool = True):
+        """
+        Wait until all queued visualizations have been written.
+        
+        Every pending write is waited for and each failure is logged.
+        
+        Args:
+            raise_errors: Re-raise the first write error (use False during
+                         cleanup, when another error is already propagating)
+            
+        Raises:
+            Exception: The first error raised while writing an image
+        """
+        pending, self._pending = self._pending, []
+        first_error = None
+        for future in pending:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Failed to save visualization: {e}")
+                if first_error is None:
+                    first_error = e
+        if first_error is not None and raise_errors:
+            raise first_error
+    
+    def close(self):
+        """
+        Write all queued visualizations and stop the writer threads.
+        
+        The visualizer cannot be used to draw afterwards.
+        
+        Raises:
+            Exception: The first error raised while writing an image
+        """
+        try:
+            self.flush()
+        finally:
+            self._writer.shutdown(wait=True)